@@ -0,0 +1,406 @@
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+from math import fsum
+
+from bookstore_concurrent import ConcurrentBookStore
+from bookstore_core import Customer, Stock, Order, Shipping, Invoice, BookStore, from_cents, sum_cents, to_cents
+from bookstore_inventory import Inventory
+from bookstore_sharded import ShardedBookStore
+
+
+def _dict_backed(name: str, fields: tuple):
+    """
+    Builds a class with the pre-__slots__ layout: attributes in a __dict__.
+    """
+    def __init__(self, *values):
+        for field, value in zip(fields, values):
+            setattr(self, field, value)
+    return type(name, (), {"__init__": __init__})
+
+
+DictCustomer = _dict_backed("DictCustomer", ("_name", "_phone", "_email"))
+DictStock = _dict_backed("DictStock", ("_name", "_price_cents", "_author", "_isbn"))
+
+
+def generate_customers(count: int, seed: int = 0) -> list:
+    """
+    Builds count synthetic customers with unique emails.
+
+    Examples:
+        >>> [c.email for c in generate_customers(2)]
+        ['customer0@example.com', 'customer1@example.com']
+    """
+    rng = random.Random(seed)
+    return [Customer(f"Customer {i}", str(rng.randrange(10**9, 10**10)), f"customer{i}@example.com")
+            for i in range(count)]
+
+
+def generate_stocks(count: int, seed: int = 0) -> list:
+    """
+    Builds count synthetic books, about ten per author.
+    """
+    rng = random.Random(seed)
+    authors = [f"Author {i}" for i in range(max(count // 10, 1))]
+    return [Stock(f"Title {i}", rng.choice(authors), rng.randrange(199, 5000) / 100) for i in range(count)]
+
+
+def generate_orders(customers: list, stocks: list, count: int, seed: int = 0) -> list:
+    """
+    Builds count ``(customer, stock, is_urgent, ship_date)`` orders over a year.
+
+    One order in five is urgent.
+    """
+    rng = random.Random(seed)
+    start = date(2025, 1, 1)
+    return [(rng.choice(customers), rng.choice(stocks), rng.random() < 0.2,
+             start + timedelta(days=rng.randrange(365))) for _ in range(count)]
+
+
+def measure(operation, items, samples: int = 100_000) -> dict:
+    """
+    Calls operation on every item, reporting throughput and latency.
+
+    Latency is timed on up to ``samples`` evenly spaced calls, so the
+    timing overhead stays small at any scale.
+    """
+    items = list(items)
+    every = max(len(items) // samples, 1)
+    latencies = array("q")
+    clock = time.perf_counter_ns
+    start = clock()
+    for i, item in enumerate(items):
+        if i % every:
+            operation(item)
+        else:
+            began = clock()
+            operation(item)
+            latencies.append(clock() - began)
+    elapsed = (clock() - start) / 1e9
+    latencies = sorted(latencies)
+    return {
+        "ops": len(items),
+        "seconds": elapsed,
+        "ops_per_sec": round(len(items) / elapsed) if elapsed else 0,
+        "p50_us": latencies[len(latencies) // 2] / 1000 if latencies else 0.0,
+        "p99_us": latencies[min(len(latencies) * 99 // 100, len(latencies) - 1)] / 1000 if latencies else 0.0,
+    }
+
+
+def peak_rss_kb():
+    """
+    Reports the peak resident set size of this process in KiB, or None.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.10) -> list:
+    """
+    Lists the measurements whose throughput fell more than tolerance below baseline.
+
+    Examples:
+        >>> compare({"search_invoice": {"ops_per_sec": 700}, "invoice": {"ops_per_sec": 990}},
+        ...         {"search_invoice": {"ops_per_sec": 1000}, "invoice": {"ops_per_sec": 1000}})
+        ['search_invoice: 700 ops/s, 30% below baseline 1,000 ops/s']
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name, {}).get("ops_per_sec")
+        if expected and result["ops_per_sec"] < expected * (1 - tolerance):
+            drop = 1 - result["ops_per_sec"] / expected
+            regressions.append(f"{name}: {result['ops_per_sec']:,} ops/s, {drop:.0%} below baseline {expected:,} ops/s")
+    return regressions
+
+
+def bytes_per_object(factory, count: int) -> float:
+    """
+    Measures the heap bytes allocated per object built by factory.
+    """
+    gc.collect()
+    objects = [None] * count
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for i in range(count):
+        objects[i] = factory()
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del objects
+    return used / count
+
+
+def bench_memory(count: int):
+    """
+    Compares bytes per customer and per book before and after __slots__.
+    """
+    name, phone, email = "Alice", "1234567890", "alice@example.com"
+    title, author, price = "1984", "George Orwell", 8.99
+    cases = [
+        ("Customer", lambda: DictCustomer(name, phone, email), lambda: Customer(name, phone, email)),
+        ("Stock", lambda: DictStock(title, to_cents(price), author, None), lambda: Stock(title, author, price)),
+    ]
+    print(f"--- Memory per object ({count:,} objects) ---")
+    for label, before, after in cases:
+        dict_bytes = bytes_per_object(before, count)
+        slot_bytes = bytes_per_object(after, count)
+        print(f"{label}: {dict_bytes:.1f} B with __dict__, {slot_bytes:.1f} B with __slots__ "
+              f"({1 - slot_bytes / dict_bytes:.0%} smaller)")
+
+
+def bench_place_orders(count: int):
+    """
+    Compares one-at-a-time order placement with BookStore.place_orders.
+    """
+    customer = Customer("Alice", "1234567890", "alice@example.com")
+    stock = Stock("1984", "George Orwell", 8.99)
+    ship_date = date(2025, 1, 1)
+    batch = [(customer, stock, i % 3 == 0, ship_date) for i in range(count)]
+
+    bookstore = BookStore()
+    start = time.perf_counter()
+    for customer, stock, is_urgent, ship_date in batch:
+        shipping = Shipping(Order(customer, stock), ship_date)
+        shipping.set_ship_cost(shipping.calc_ship_cost(is_urgent))
+        invoice = Invoice(f"INV{len(bookstore) + 1:04}", stock, shipping)
+        bookstore.add_invoice(invoice)
+        invoice.invoice()
+    single = time.perf_counter() - start
+
+    bookstore = BookStore()
+    start = time.perf_counter()
+    bookstore.place_orders(batch)
+    batched = time.perf_counter() - start
+
+    print(f"--- Order placement ({count:,} orders) ---")
+    print(f"One at a time: {count / single:,.0f} orders/s")
+    print(f"place_orders:  {count / batched:,.0f} orders/s")
+
+
+def bench_threads(count: int):
+    """
+    Measures ConcurrentBookStore order intake from 1 to 32 writer threads.
+    """
+    customer = Customer("Alice", "1234567890", "alice@example.com")
+    stock = Stock("1984", "George Orwell", 8.99)
+    ship_date = date(2025, 1, 1)
+
+    def writer(bookstore, orders):
+        for i in range(orders):
+            bookstore.place_orders([(customer, stock, i % 3 == 0, ship_date)])
+
+    print(f"--- Concurrent order intake ({count:,} orders) ---")
+    for threads in (1, 2, 4, 8, 16, 32):
+        bookstore = ConcurrentBookStore()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for _ in range(threads):
+                pool.submit(writer, bookstore, count // threads)
+        elapsed = time.perf_counter() - start
+        assert len(bookstore) == count // threads * threads
+        print(f"{threads:>2} threads: {len(bookstore) / elapsed:,.0f} orders/s")
+
+
+def bench_inventory(count: int):
+    """
+    Measures reserve/commit cycles on one hot title from 1 to 32 threads.
+    """
+    stock = Stock("1984", "George Orwell", 8.99)
+
+    def buyer(inventory, cycles):
+        for _ in range(cycles):
+            inventory.commit(inventory.reserve(stock))
+
+    print(f"--- Inventory reservations on one title ({count:,} reservations) ---")
+    for threads in (1, 2, 4, 8, 16, 32):
+        inventory = Inventory()
+        inventory.receive(stock, count)
+        cycles = count // threads
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for _ in range(threads):
+                pool.submit(buyer, inventory, cycles)
+        elapsed = time.perf_counter() - start
+        level = inventory.level(stock)
+        assert level.committed == cycles * threads and level.reserved == 0
+        assert level.on_hand + level.committed == count
+        print(f"{threads:>2} threads: {cycles * threads / elapsed:,.0f} reservations/s")
+
+
+def bench_money(count: int):
+    """
+    Compares summing invoice totals as floats, Decimals and integer cents.
+    """
+    amounts = [(899 + 100 * (i % 50), 395 if i % 3 else 545) for i in range(count)]
+    floats = [from_cents(price) + from_cents(ship_cost) for price, ship_cost in amounts]
+    decimals = [Decimal(price).scaleb(-2) + Decimal(ship_cost).scaleb(-2) for price, ship_cost in amounts]
+    cents = array("q", (price + ship_cost for price, ship_cost in amounts))
+    cases = [
+        ("float (fsum)", lambda: round(fsum(floats), 2)),
+        ("Decimal", lambda: sum(decimals, Decimal(0))),
+        ("int cents", lambda: sum_cents(cents) / 100),
+    ]
+    print(f"--- Money totals ({count:,} invoices) ---")
+    for label, total in cases:
+        start = time.perf_counter()
+        result = total()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<13} {count / elapsed:,.0f} amounts/s (total {result})")
+
+
+def bench_processes(count: int):
+    """
+    Measures ShardedBookStore order intake from 1 to 8 worker processes,
+    replying with invoice copies and with summaries, and the router's CPU
+    share of the elapsed time.
+    """
+    customer = Customer("Alice", "1234567890", "alice@example.com")
+    stock = Stock("1984", "George Orwell", 8.99)
+    ship_date = date(2025, 1, 1)
+    batch = [(customer, stock, i % 3 == 0, ship_date) for i in range(1000)]
+
+    print(f"--- Sharded order intake ({count:,} orders, batches of {len(batch):,}) ---")
+    for workers in (1, 2, 4, 8):
+        results = []
+        for summary in (False, True):
+            with ShardedBookStore(workers=workers) as bookstore:
+                start, cpu = time.perf_counter(), time.process_time()
+                for _ in range(count // len(batch)):
+                    bookstore.place_orders(batch, summary=summary)
+                elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu
+                assert len(bookstore) == count // len(batch) * len(batch)
+            results.append(f"{count // len(batch) * len(batch) / elapsed:,.0f} orders/s "
+                           f"(router CPU {cpu / elapsed:.0%})")
+        print(f"{workers} processes: invoices {results[0]}, summaries {results[1]}")
+
+
+def bench_carts(count: int):
+    """
+    Compares ten-book purchases as ten orders and as one multi-line order.
+    """
+    customer = Customer("Alice", "1234567890", "alice@example.com")
+    books = [Stock(f"Book {i}", "Anonymous", 5.0 + i) for i in range(10)]
+    ship_date = date(2025, 1, 1)
+    purchases = count // len(books)
+    cases = [
+        ("10 orders", [(customer, book, False, ship_date) for book in books]),
+        ("1 cart", [(customer, [(book, 1) for book in books], False, ship_date)]),
+    ]
+    print(f"--- Ten-book purchases ({purchases:,} purchases) ---")
+    for label, batch in cases:
+        bookstore = BookStore()
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        for _ in range(purchases):
+            bookstore.place_orders(batch)
+        elapsed = time.perf_counter() - start
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{label:<9} {purchases / elapsed:,.0f} purchases/s, {len(bookstore):,} invoices, "
+              f"{used / purchases:,.0f} B per purchase")
+
+
+def bench_suite(count: int) -> dict:
+    """
+    Measures the core hot paths on synthetic data and returns the results.
+
+    Customers and books are generated at a tenth of count each, then count
+    orders over them.  ``place_orders`` runs in batches of 1,000, so its
+    throughput counts orders but its latencies are per batch.
+    """
+    catalog_size = max(count // 10, 1)
+    rows = [(f"Customer {i}", "5550000000", f"customer{i}@example.com", f"Title {i}", f"Author {i % 97}",
+             1.99 + i % 4000 / 100) for i in range(catalog_size)]
+    customers = generate_customers(catalog_size)
+    stocks = generate_stocks(catalog_size)
+    orders = generate_orders(customers, stocks, count)
+    invoices = []
+    for i, (customer, stock, is_urgent, ship_date) in enumerate(orders, 1):
+        shipping = Shipping(Order(customer, stock), ship_date)
+        shipping.ship_cost_cents = 545 if is_urgent else 395
+        shipping.is_urgent = is_urgent
+        invoices.append(Invoice(f"INV{i:04}", stock, shipping))
+    numbers = [invoice.invoice_nbr for invoice in random.Random(1).sample(invoices, len(invoices))]
+    bookstore = BookStore()
+    batches = [orders[i:i + 1000] for i in range(0, len(orders), 1000)]
+
+    results = {
+        "construct": measure(lambda row: (Customer(row[0], row[1], row[2]), Stock(row[3], row[4], row[5])), rows),
+        "add_invoice": measure(bookstore.add_invoice, invoices),
+        "search_invoice": measure(bookstore.search_invoice, numbers),
+        "invoice": measure(Invoice.invoice, invoices),
+    }
+    placed = measure(BookStore().place_orders, batches)
+    placed.update(ops=len(orders), ops_per_sec=round(len(orders) / placed["seconds"]))
+    results["place_orders"] = placed
+
+    print(f"--- Core suite ({count:,} orders, {catalog_size:,} customers and books) ---")
+    for name, result in results.items():
+        print(f"{name:<15} {result['ops_per_sec']:>12,} ops/s   p50 {result['p50_us']:8.2f} us   "
+              f"p99 {result['p99_us']:8.2f} us")
+    return results
+
+
+BENCHMARKS = {
+    "memory": bench_memory,
+    "orders": bench_place_orders,
+    "threads": bench_threads,
+    "inventory": bench_inventory,
+    "money": bench_money,
+    "processes": bench_processes,
+    "carts": bench_carts,
+    "suite": bench_suite,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bookstore core benchmarks")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--count", type=int, default=1_000_000, help="objects per measurement")
+    parser.add_argument("--json", help="write the suite results and peak RSS to this JSON file")
+    parser.add_argument("--baseline", help="fail if the suite is slower than this earlier --json file")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown against the baseline")
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(sorted(unknown))}")
+    results = {}
+    for name in args.names or BENCHMARKS:
+        result = BENCHMARKS[name](args.count)
+        if result is not None:
+            results.update(result)
+
+    report = {
+        "count": args.count,
+        "python": platform.python_version(),
+        "peak_rss_kb": peak_rss_kb(),
+        "results": results,
+    }
+    print(f"Peak RSS: {report['peak_rss_kb'] or 0:,} KiB")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
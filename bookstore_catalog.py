@@ -0,0 +1,294 @@
+import re
+import unicodedata
+from bisect import bisect_left, insort
+
+from bookstore_core import Stock
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """
+    Folds case and strips diacritics so lookups ignore both.
+
+    Examples:
+        >>> normalize("Gabriel García Márquez")
+        'gabriel garcia marquez'
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokenize(text: str) -> list:
+    """
+    Splits text into normalized word tokens.
+
+    Examples:
+        >>> tokenize("The Catcher in the Rye")
+        ['the', 'catcher', 'in', 'the', 'rye']
+    """
+    return _WORD.findall(normalize(text))
+
+
+class PrefixIndex:
+    """
+    Represents a sorted key index that maps each key to an ordered set of items.
+
+    Keys live in a sorted list, so every key starting with a prefix is found
+    with one binary search and a forward scan.
+
+    Examples:
+        >>> index = PrefixIndex()
+        >>> index.add("orwell", "1984")
+        >>> index.add("orwell", "Animal Farm")
+        >>> index.add("austen", "Emma")
+        >>> index.search("or")
+        ['1984', 'Animal Farm']
+        >>> index.remove("orwell", "1984")
+        >>> index.search("or")
+        ['Animal Farm']
+    """
+    def __init__(self):
+        self._keys = []
+        self._items = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: str, item):
+        """
+        Adds an item under a key.
+        """
+        items = self._items.get(key)
+        if items is None:
+            items = self._items[key] = {}
+            insort(self._keys, key)
+        items[item] = None
+
+    def remove(self, key: str, item):
+        """
+        Removes an item from a key, dropping the key once it has no items.
+        """
+        items = self._items.get(key)
+        if items is None:
+            return
+        items.pop(item, None)
+        if not items:
+            del self._items[key]
+            del self._keys[bisect_left(self._keys, key)]
+
+    def get(self, key: str) -> dict:
+        """
+        Retrieves the items stored under exactly this key, as an ordered set.
+        """
+        return self._items.get(key, {})
+
+    def keys(self, prefix: str):
+        """
+        Iterates over the keys starting with prefix, in sorted order.
+        """
+        keys = self._keys
+        for i in range(bisect_left(keys, prefix), len(keys)):
+            if not keys[i].startswith(prefix):
+                break
+            yield keys[i]
+
+    def search(self, prefix: str, limit: int = None) -> list:
+        """
+        Retrieves up to limit distinct items whose key starts with prefix.
+        """
+        found = {}
+        for key in self.keys(prefix):
+            for item in self._items[key]:
+                found[item] = None
+                if limit is not None and len(found) >= limit:
+                    return list(found)
+        return list(found)
+
+
+class Catalog:
+    """
+    Represents a searchable catalog of books.
+
+    Title and author tokens go into an inverted index kept in a
+    ``PrefixIndex``, so a word query intersects posting lists (smallest
+    first) and the last word of a query may be a prefix for search-as-you-type.
+    Whole titles are kept in a second prefix index for autocomplete.
+    Matching ignores case and diacritics.  Books are indexed when added and
+    re-indexed only when their title or author changes.
+
+    Examples:
+        >>> catalog = Catalog()
+        >>> catalog.add(Stock("1984", "George Orwell", 8.99))
+        >>> catalog.add(Stock("Animal Farm", "George Orwell", 7.49))
+        >>> catalog.add(Stock("Cien años de soledad", "Gabriel García Márquez", 12.5))
+        >>> [stock.name for stock in catalog.search("orwell")]
+        ['1984', 'Animal Farm']
+        >>> [stock.name for stock in catalog.search("george an")]
+        ['Animal Farm']
+        >>> [stock.name for stock in catalog.search("garcia")]
+        ['Cien años de soledad']
+        >>> [stock.name for stock in catalog.autocomplete("ani")]
+        ['Animal Farm']
+    """
+    def __init__(self):
+        self._tokens = {}
+        self._words = PrefixIndex()
+        self._titles = PrefixIndex()
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def __contains__(self, stock) -> bool:
+        return stock in self._tokens
+
+    def __iter__(self):
+        return iter(self._tokens)
+
+    def add(self, stock: Stock):
+        """
+        Adds a book to the catalog.
+        """
+        if stock in self._tokens:
+            return
+        tokens = set(tokenize(stock.name)) | set(tokenize(stock.author))
+        self._tokens[stock] = (normalize(stock.name), tokens)
+        for token in tokens:
+            self._words.add(token, stock)
+        self._titles.add(normalize(stock.name), stock)
+
+    def remove(self, stock: Stock):
+        """
+        Removes a book from the catalog.
+        """
+        entry = self._tokens.pop(stock, None)
+        if entry is None:
+            return
+        title, tokens = entry
+        for token in tokens:
+            self._words.remove(token, stock)
+        self._titles.remove(title, stock)
+
+    def update(self, stock: Stock, name: str = None, author: str = None, price: float = None):
+        """
+        Changes a book's details, re-indexing it only if its text changed.
+
+        A rejected name or author leaves the book indexed under the details
+        it kept.
+
+        Examples:
+            >>> catalog = Catalog()
+            >>> stock = Stock("1984", "George Orwell", 8.99)
+            >>> catalog.add(stock)
+            >>> catalog.update(stock, author="Eric Blair", price=9.49)
+            >>> catalog.search("orwell"), [s.price for s in catalog.search("blair")]
+            ([], [9.49])
+            >>> catalog.update(stock, author=" ")
+            Traceback (most recent call last):
+            ...
+            ValueError: Author name cannot be empty.
+            >>> [s.author for s in catalog.search("1984")]
+            ['Eric Blair']
+        """
+        if price is not None:
+            stock.price = price
+        if name is None and author is None:
+            return
+        self.remove(stock)
+        try:
+            if name is not None:
+                stock.name = name
+            if author is not None:
+                stock.author = author
+        finally:
+            self.add(stock)
+
+    def search(self, query: str, limit: int = None) -> list:
+        """
+        Retrieves the books matching every word of the query.
+
+        The last word also matches as a prefix.
+        """
+        return _match(self._words, lambda stock: self._tokens[stock][1], tokenize(query), limit)
+
+    def autocomplete(self, prefix: str, limit: int = 10) -> list:
+        """
+        Retrieves up to limit books whose title starts with prefix.
+        """
+        return self._titles.search(normalize(prefix), limit)
+
+
+class Typeahead:
+    """
+    Represents typeahead matching over a growing list, returning stable ids.
+
+    An item's id is its position in the list, which must only ever grow.
+    ``sync`` indexes just the items appended since the previous call, so
+    keeping up with new customers or books never rebuilds the index.  A
+    query matches the items whose label has every word of the query, the
+    last one as a prefix.
+
+    Examples:
+        >>> books = [Stock("1984", "George Orwell", 8.99), Stock("Emma", "Jane Austen", 6.5)]
+        >>> typeahead = Typeahead(books, lambda stock: f"{stock.name} by {stock.author}")
+        >>> typeahead.sync()
+        >>> books.append(Stock("Animal Farm", "George Orwell", 7.49))
+        >>> typeahead.sync()
+        >>> typeahead.search("george a")
+        [2]
+        >>> [typeahead.label(books[i]) for i in typeahead.search("orw")]
+        ['1984 by George Orwell', 'Animal Farm by George Orwell']
+    """
+    def __init__(self, items: list, label):
+        self.items = items
+        self.label = label
+        self._words = PrefixIndex()
+        self._tokens = []
+
+    def sync(self):
+        """
+        Indexes the items appended since the last sync.
+        """
+        for item_id in range(len(self._tokens), len(self.items)):
+            tokens = set(tokenize(self.label(self.items[item_id])))
+            self._tokens.append(tokens)
+            for token in tokens:
+                self._words.add(token, item_id)
+
+    def search(self, query: str, limit: int = 50) -> list:
+        """
+        Retrieves up to limit ids of matching items; every id for an empty query.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return list(range(min(limit, len(self._tokens))))
+        return _match(self._words, self._tokens.__getitem__, tokens, limit)
+
+
+def _match(words: PrefixIndex, tokens_of, tokens: list, limit: int = None) -> list:
+    if not tokens:
+        return []
+    *exact, last = tokens
+    postings = [words.get(word) for word in exact]
+    if not all(postings):
+        return []
+    postings.sort(key=len)
+    if postings:
+        candidates = postings[0]
+        rest = postings[1:]
+    else:
+        candidates = words.search(last, limit)
+        rest = []
+    results = []
+    for item in candidates:
+        if all(item in posting for posting in rest) and (
+                not exact or any(token.startswith(last) for token in tokens_of(item))):
+            results.append(item)
+            if limit is not None and len(results) >= limit:
+                break
+    return results
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,213 @@
+import threading
+
+from bookstore_core import BookStore, format_invoice_nbr
+
+
+class InvoiceNumberAllocator:
+    """
+    Hands out unique invoice numbers to concurrent writers.
+
+    Examples:
+        >>> allocator = InvoiceNumberAllocator()
+        >>> allocator.allocate(2)
+        ['INV0001', 'INV0002']
+        >>> allocator.allocate()
+        ['INV0003']
+    """
+    def __init__(self, start: int = 1, is_taken=None):
+        self._next = start
+        self._is_taken = is_taken
+        self._lock = threading.Lock()
+
+    def allocate(self, count: int = 1) -> list:
+        """
+        Reserves a block of consecutive unused invoice numbers.
+        """
+        numbers = []
+        with self._lock:
+            seq = self._next
+            while len(numbers) < count:
+                invoice_nbr = format_invoice_nbr(seq)
+                seq += 1
+                if self._is_taken is None or not self._is_taken(invoice_nbr):
+                    numbers.append(invoice_nbr)
+            self._next = seq
+        return numbers
+
+
+class ConcurrentBookStore:
+    """
+    Represents a thread-safe invoice repository with lock striping.
+
+    Invoices are spread over ``shards`` independent ``BookStore`` instances by
+    hash of the invoice number, each guarded by its own lock, so writers to
+    different shards never wait on each other.  Invoice numbers come from a
+    shared ``InvoiceNumberAllocator``.  Queries spanning every shard (customer
+    and book lookups, listing) take the shard locks one at a time.  Price and
+    shipping changes reach a shard through an observer that takes the
+    shard's lock before re-crediting the invoice.
+
+    Examples:
+        >>> from datetime import date
+        >>> from bookstore_core import Customer, Stock
+        >>> customer = Customer("Alice", "1234567890", "alice@example.com")
+        >>> stock = Stock("1984", "George Orwell", 8.99)
+        >>> bookstore = ConcurrentBookStore(shards=4)
+        >>> invoice, = bookstore.place_orders([(customer, stock, True, date(2025, 1, 1))])
+        >>> bookstore.search_invoice(invoice.invoice_nbr).invoice()
+        14.44
+        >>> len(bookstore)
+        1
+    """
+    def __init__(self, shards: int = 16):
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._shards = [BookStore(lock) for lock in self._locks]
+        self._allocator = InvoiceNumberAllocator(is_taken=self.__contains__)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def __contains__(self, invoice_nbr) -> bool:
+        return invoice_nbr in self._shards[self._shard_of(invoice_nbr)]
+
+    @property
+    def get_invoices(self) -> list:
+        """
+        Retrieves the list of invoices, shard by shard.
+        """
+        return self._gather(lambda shard: shard.invoices)
+
+    def allocate_invoice_nbrs(self, count: int = 1) -> list:
+        """
+        Reserves a block of consecutive unused invoice numbers.
+        """
+        return self._allocator.allocate(count)
+
+    def add_invoice(self, invoice):
+        """
+        Adds an invoice, rejecting duplicate invoice numbers.
+        """
+        i = self._shard_of(invoice.invoice_nbr)
+        with self._locks[i]:
+            self._shards[i].add_invoice(invoice)
+
+    def place_orders(self, batch, inventory=None) -> list:
+        """
+        Places a batch of ``(customer, stock, is_urgent, ship_date)`` orders.
+
+        Pricing happens outside the locks.  The locks of the shards the
+        batch touches are then taken in shard order and held while each shard
+        stores its part, so the batch is all-or-nothing: if a shard rejects
+        its part, the parts already stored are removed again before the
+        error is raised and ``inventory``, as in ``BookStore.place_orders``,
+        gets its copies back.
+        """
+        batch = list(batch)
+        with BookStore.reserved(inventory, batch):
+            invoices = BookStore.price_orders(self.allocate_invoice_nbrs(len(batch)), batch)
+            by_shard = {}
+            for invoice in invoices:
+                by_shard.setdefault(self._shard_of(invoice.invoice_nbr), []).append(invoice)
+            shards = sorted(by_shard)
+            for i in shards:
+                self._locks[i].acquire()
+            try:
+                stored = []
+                try:
+                    for i in shards:
+                        self._shards[i].store_invoices(by_shard[i])
+                        stored.append(i)
+                except BaseException:
+                    for i in stored:
+                        for invoice in by_shard[i]:
+                            self._shards[i].remove_invoice(invoice.invoice_nbr)
+                    raise
+            finally:
+                for i in shards:
+                    self._locks[i].release()
+        return invoices
+
+    def remove_invoice(self, invoice_nbr: str):
+        """
+        Removes an invoice by its number and returns it, or None if absent.
+        """
+        i = self._shard_of(invoice_nbr)
+        with self._locks[i]:
+            return self._shards[i].remove_invoice(invoice_nbr)
+
+    def replace_invoice(self, invoice):
+        """
+        Stores an invoice in place of any invoice with the same number.
+        """
+        i = self._shard_of(invoice.invoice_nbr)
+        with self._locks[i]:
+            return self._shards[i].replace_invoice(invoice)
+
+    def search_invoice(self, invoice_nbr: str):
+        """
+        Searches for an invoice by its number.
+        """
+        return self._shards[self._shard_of(invoice_nbr)].search_invoice(invoice_nbr)
+
+    def invoices_for_customer(self, email: str) -> list:
+        """
+        Retrieves the invoices of the customer with the given email.
+        """
+        return self._gather(lambda shard: shard.invoices_for_customer(email))
+
+    def invoices_for_stock(self, stock) -> list:
+        """
+        Retrieves the invoices that include the given book.
+        """
+        return self._gather(lambda shard: shard.invoices_for_stock(stock))
+
+    @property
+    def revenue(self) -> float:
+        """
+        Retrieves the total of every invoice.
+        """
+        return self._sum(lambda shard: shard.revenue_cents) / 100
+
+    def stats(self) -> dict:
+        """
+        Summarizes the invoices across shards, like ``BookStore.stats``.
+        """
+        tallies = []
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                tallies.append(shard.tally())
+        return BookStore.summarize(tallies)
+
+    def customer_revenue(self, email: str) -> float:
+        """
+        Retrieves the total spent by the customer with the given email.
+        """
+        return self._sum(lambda shard: shard.customer_revenue_cents(email)) / 100
+
+    def stock_revenue(self, stock) -> float:
+        """
+        Retrieves the total of the invoices that include the given book.
+        """
+        return self._sum(lambda shard: shard.stock_revenue_cents(stock)) / 100
+
+    def _sum(self, query) -> int:
+        total = 0
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                total += query(shard)
+        return total
+
+    def _shard_of(self, invoice_nbr: str) -> int:
+        return hash(invoice_nbr) % len(self._shards)
+
+    def _gather(self, query) -> list:
+        results = []
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                results.extend(query(shard))
+        return results
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -1,7 +1,197 @@
+import asyncio
+import functools
+import inspect
+import re
+import sys
+import threading
+import time
+import weakref
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+from datetime import date
+
+from bookstore_rates import DEFAULT_RATES, DEFAULT_ZONE, RateEngine
+
+_ISBN = re.compile(r"\d{9}[\dX]|\d{13}")
+
+# Guard the first registrations on shared objects.  Each object maps to one
+# of these locks by its id, so unrelated objects seldom contend and none
+# carries a lock of its own.
+_observer_locks = tuple(threading.Lock() for _ in range(64))
+
+
+def to_cents(amount) -> int:
+    """
+    Converts an amount of money to integer cents, rounding half to even.
+
+    Examples:
+        >>> to_cents(8.99), to_cents(5.45)
+        (899, 545)
+    """
+    return round(amount * 100)
+
+
+def from_cents(cents: int) -> float:
+    """
+    Converts integer cents to a float amount for display.
+    """
+    return cents / 100
+
+
+def sum_cents(cents) -> int:
+    """
+    Adds up cents exactly; an ``array("q")`` of cents sums in C.
+
+    Examples:
+        >>> from array import array
+        >>> from_cents(sum_cents(array("q", [899, 395] * 1000)))
+        12940.0
+    """
+    return sum(cents)
+
+
+def format_invoice_nbr(seq: int) -> str:
+    """
+    Formats the invoice number that every allocator hands out for a sequence number.
+
+    Examples:
+        >>> format_invoice_nbr(7), format_invoice_nbr(12345)
+        ('INV0007', 'INV12345')
+    """
+    return f"INV{seq:04}"
+
+
+def normalize_isbn(isbn: str) -> str:
+    """
+    Strips hyphens and spaces from an ISBN-10 or ISBN-13, raising ValueError if malformed.
+
+    Examples:
+        >>> normalize_isbn("978-0-452-28423-4")
+        '9780452284234'
+        >>> normalize_isbn("0-452-2842x")
+        Traceback (most recent call last):
+        ...
+        ValueError: Invalid ISBN: 0-452-2842x
+    """
+    compact = isbn.replace("-", "").replace(" ", "").upper()
+    if not _ISBN.fullmatch(compact):
+        raise ValueError(f"Invalid ISBN: {isbn}")
+    return compact
+
+
+class _Observers(set):
+    # Weak references to the observers of one object.  Each reference
+    # discards itself when its observer dies, through one shared callback.
+    __slots__ = ("drop",)
+
+    def __init__(self):
+        super().__init__()
+        self.drop = self.discard
+
+
+class Observable:
+    """
+    Represents an object whose dependents are told when its value changes.
+
+    Observers are held weakly and must define ``changed(source)``; it is
+    called after every change, so they can drop cached values derived from
+    this one.  A single observer is kept as a bare weak reference and only
+    a second one allocates a set of them.  An object nobody observes, such
+    as one still being built, is changed without notifying.  Classes whose
+    instances are shared across threads set ``_shared``, which makes the
+    move from one observer to a set thread-safe; once there, observers are
+    added and copied with single set operations, which need no lock.  The
+    rest are wired by the thread that builds them, like the rest of their
+    state.  Observers are not pickled; each subclass re-subscribes to its
+    own inputs in ``_watch`` when unpickled.
+    """
+    __slots__ = ("_observers", "__weakref__")
+    _shared = False
+
+    def subscribe(self, observer):
+        """
+        Registers an observer to be told of changes.
+        """
+        observers = self._observers
+        if type(observers) is _Observers:
+            observers.add(weakref.ref(observer, observers.drop))
+        elif not self._shared:
+            if observers is None:
+                self._observers = weakref.ref(observer)
+            else:
+                self._add(observer)
+        else:
+            with _observer_locks[id(self) >> 4 & 63]:
+                self._add(observer)
+
+    def unsubscribe(self, observer):
+        """
+        Stops telling an observer of changes.
+        """
+        observers = self._observers
+        if type(observers) is _Observers:
+            observers.discard(weakref.ref(observer))
+        elif self._shared:
+            with _observer_locks[id(self) >> 4 & 63]:
+                self._discard(observer)
+        else:
+            self._discard(observer)
+
+    def _add(self, observer):
+        observers = self._observers
+        if observers is None:
+            self._observers = weakref.ref(observer)
+        elif type(observers) is _Observers:
+            observers.add(weakref.ref(observer, observers.drop))
+        else:
+            first = observers()
+            if first is not observer:
+                observers = _Observers()
+                for each in (first, observer):
+                    if each is not None:
+                        observers.add(weakref.ref(each, observers.drop))
+                self._observers = observers
+
+    def _discard(self, observer):
+        observers = self._observers
+        if type(observers) is _Observers:
+            observers.discard(weakref.ref(observer))
+        elif observers is not None and observers() in (observer, None):
+            self._observers = None
+
+    def _changed(self):
+        observers = self._observers
+        if observers is None:
+            return
+        if type(observers) is weakref.ref:
+            observer = observers()
+            if observer is not None:
+                observer.changed(self)
+            return
+        for ref in tuple(observers):
+            observer = ref()
+            if observer is not None:
+                observer.changed(self)
+
+    def _watch(self):
+        pass
+
+    def __getstate__(self) -> dict:
+        return {name: getattr(self, name) for name in _state_slots(type(self)) if hasattr(self, name)}
+
+    def __setstate__(self, state: dict):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._observers = None
+        self._watch()
+
+
 class Person:
     """
     Represents a base class for any person-related entities.
     """
+    __slots__ = ("_name", "_phone", "_email")
+
     def __init__(self, name: str, phone: str, email: str):
         """
         Examples:
@@ -13,6 +203,22 @@ class Person:
         self.phone = phone
         self.email = email
 
+    @classmethod
+    def from_trusted(cls, name: str, phone: str, email: str):
+        """
+        Builds an instance from fields that were validated before they were
+        saved, such as those in our own snapshots, without running the setters.
+
+        Examples:
+            >>> Customer.from_trusted("Alice", "1234567890", "alice@example.com").email
+            'alice@example.com'
+        """
+        person = cls.__new__(cls)
+        person._name = name
+        person._phone = phone
+        person._email = email
+        return person
+
     @property
     def name(self) -> str:
         return self._name
@@ -44,10 +250,19 @@ class Person:
         self._email = value
 
 
-class Product:
+class Product(Observable):
     """
     Represents a base class for any product-related entities.
+
+    The price is held in integer cents; ``price`` converts to and from a
+    float amount, so a price that rounds to zero cents is rejected.  Names
+    are interned, so products sharing a name share one string.  Orders for
+    the product observe it, so a price change reaches their totals; as the
+    orders may be built on any thread, the product is ``_shared``.
     """
+    __slots__ = ("_name", "_price_cents")
+    _shared = True
+
     def __init__(self, name: str, price: float):
         """
         Examples:
@@ -55,6 +270,7 @@ class Product:
             >>> product.name
             '1984'
         """
+        self._observers = None
         self.name = name
         self.price = price
 
@@ -66,23 +282,43 @@ class Product:
     def name(self, value: str):
         if not value.strip():
             raise ValueError("Product name cannot be empty.")
-        self._name = value
+        self._name = sys.intern(value)
+
+    def __setstate__(self, state: dict):
+        super().__setstate__(state)
+        self._name = sys.intern(self._name)
 
     @property
     def price(self) -> float:
-        return self._price
+        return self._price_cents / 100
 
     @price.setter
     def price(self, value: float):
+        self.price_cents = to_cents(value)
+
+    @property
+    def price_cents(self) -> int:
+        return self._price_cents
+
+    @price_cents.setter
+    def price_cents(self, value: int):
         if value <= 0:
             raise ValueError("Price must be greater than zero.")
-        self._price = value
+        if self._observers is not None and value == self._price_cents:
+            return
+        self._price_cents = value
+        # Checked after the write, so an order subscribing on another thread
+        # is either told or sums the new price.
+        if self._observers is not None:
+            self._changed()
 
 
 class Customer(Person):
     """
     Represents a customer in the bookstore system, inheriting from Person.
     """
+    __slots__ = ()
+
     def __init__(self, name: str, phone: str, email: str):
         """
         Examples:
@@ -96,16 +332,43 @@ class Customer(Person):
 class Stock(Product):
     """
     Represents a book in the bookstore's stock, inheriting from Product.
+
+    The ISBN is optional and kept without hyphens.  Author names are
+    interned like titles, so an author's books share one string.
     """
-    def __init__(self, name: str, author: str, price: float):
+    __slots__ = ("_author", "_isbn")
+
+    def __init__(self, name: str, author: str, price: float, isbn: str = None):
         """
         Examples:
             >>> stock = Stock("1984", "George Orwell", 8.99)
             >>> stock.author
             'George Orwell'
+            >>> Stock("1984", "George Orwell", 8.99, isbn="978-0-452-28423-4").isbn
+            '9780452284234'
         """
         super().__init__(name, price)
         self.author = author
+        self.isbn = isbn
+
+    @classmethod
+    def from_trusted(cls, name: str, author: str, price: float, isbn: str = None) -> "Stock":
+        """
+        Builds a book from fields that were validated before they were saved,
+        without running the setters; ``isbn`` must already be normalized.
+
+        Examples:
+            >>> stock = Stock.from_trusted("1984", "George Orwell", 8.99, "9780452284234")
+            >>> stock.price_cents, stock.isbn
+            (899, '9780452284234')
+        """
+        stock = cls.__new__(cls)
+        stock._observers = None
+        stock._name = sys.intern(name)
+        stock._price_cents = to_cents(price)
+        stock._author = sys.intern(author)
+        stock._isbn = isbn
+        return stock
 
     @property
     def author(self) -> str:
@@ -115,14 +378,49 @@ class Stock(Product):
     def author(self, value: str):
         if not value.strip():
             raise ValueError("Author name cannot be empty.")
-        self._author = value
+        self._author = sys.intern(value)
+
+    def __setstate__(self, state: dict):
+        super().__setstate__(state)
+        self._author = sys.intern(self._author)
+
+    @property
+    def isbn(self) -> str:
+        return self._isbn
 
+    @isbn.setter
+    def isbn(self, value: str):
+        self._isbn = normalize_isbn(value) if value else None
 
-class Order:
+
+class OrderLine:
     """
-    Represents an order placed by a customer for a book.
+    Represents a quantity of one book within an order.
+
+    Change quantities through the order, so its cached subtotal is reset.
     """
-    def __init__(self, customer: Customer, stock: Stock):
+    __slots__ = ("stock", "quantity")
+
+    def __init__(self, stock: Stock, quantity: int = 1):
+        if quantity <= 0:
+            raise ValueError("Quantity must be greater than zero.")
+        self.stock = stock
+        self.quantity = quantity
+
+
+class Order(Observable):
+    """
+    Represents an order placed by a customer for one or more books.
+
+    Each book is one ``OrderLine``.  The subtotal is summed in one pass over
+    the lines and cached until a line changes or one of the books changes
+    price.  ``stock`` is the book of the first line, which for a single-book
+    order is its only book.  ``revision`` counts the line edits made while
+    something observes the order, such as the invoice it belongs to.
+    """
+    __slots__ = ("customer", "_lines", "_subtotal_cents", "revision")
+
+    def __init__(self, customer: Customer, stock: Stock = None, quantity: int = 1):
         """
         Examples:
             >>> customer = Customer("Alice", "1234567890", "alice@example.com")
@@ -131,19 +429,164 @@ class Order:
             >>> order.customer.name
             'Alice'
         """
+        self._observers = None
         self.customer = customer
-        self.stock = stock
+        self._lines = []
+        self._subtotal_cents = None
+        self.revision = 0
+        if stock is not None:
+            self._lines.append(OrderLine(stock, quantity))
+            stock.subscribe(self)
 
-class Shipping:
+    @classmethod
+    def from_lines(cls, customer: Customer, lines) -> "Order":
+        """
+        Builds an order from ``(stock, quantity)`` pairs.
+
+        Examples:
+            >>> customer = Customer("Alice", "1234567890", "alice@example.com")
+            >>> order = Order.from_lines(customer, [(Stock("1984", "George Orwell", 8.99), 2),
+            ...                                     (Stock("Emma", "Jane Austen", 6.5), 1)])
+            >>> order.subtotal_cents, len(order.lines)
+            (2448, 2)
+        """
+        order = cls(customer)
+        for stock, quantity in lines:
+            order.add_line(stock, quantity)
+        return order
+
+    @property
+    def stock(self) -> Stock:
+        return self._lines[0].stock if self._lines else None
+
+    @property
+    def lines(self) -> tuple:
+        return tuple(self._lines)
+
+    def add_line(self, stock: Stock, quantity: int = 1):
+        """
+        Adds copies of a book, merging with an existing line for it.
+        """
+        for line in self._lines:
+            if line.stock is stock:
+                self.set_quantity(stock, line.quantity + quantity)
+                return
+        self._lines.append(OrderLine(stock, quantity))
+        stock.subscribe(self)
+        self._edited()
+        self.changed(stock)
+
+    def set_quantity(self, stock: Stock, quantity: int):
+        """
+        Changes the quantity of a book; zero removes its line.
+
+        Examples:
+            >>> customer = Customer("Alice", "1234567890", "alice@example.com")
+            >>> stock = Stock("1984", "George Orwell", 8.99)
+            >>> order = Order(customer, stock)
+            >>> order.set_quantity(stock, 3)
+            >>> order.subtotal_cents
+            2697
+        """
+        if quantity < 0:
+            raise ValueError("Quantity must be greater than zero.")
+        for i, line in enumerate(self._lines):
+            if line.stock is stock:
+                if quantity:
+                    line.quantity = quantity
+                else:
+                    del self._lines[i]
+                    stock.unsubscribe(self)
+                self._edited()
+                self.changed(stock)
+                return
+        if quantity:
+            self.add_line(stock, quantity)
+
+    def remove_line(self, stock: Stock):
+        """
+        Removes the line for a book, if any.
+        """
+        self.set_quantity(stock, 0)
+
+    @property
+    def subtotal_cents(self) -> int:
+        """
+        Retrieves the total price of the lines in cents.
+        """
+        cents = self._subtotal_cents
+        if cents is None:
+            # The fill takes no lock.  If a price or line changed while it
+            # summed, that change's invalidation may have run before the
+            # store, so the sum is checked again and dropped if it moved.
+            cents = self._subtotal_cents = self._sum()
+            fresh = self._sum()
+            if fresh != cents:
+                self._subtotal_cents = None
+                cents = fresh
+        return cents
+
+    def _sum(self) -> int:
+        cents = 0
+        for line in self._lines:
+            cents += line.stock.price_cents * line.quantity
+        return cents
+
+    def changed(self, source):
+        """
+        Drops the cached subtotal and tells the order's observers.
+        """
+        self._subtotal_cents = None
+        self._changed()
+
+    def _edited(self):
+        if self._observers is not None:
+            self.revision += 1
+
+    def _watch(self):
+        for line in self._lines:
+            line.stock.subscribe(self)
+
+class Shipping(Observable):
     """
     Represents the shipping details for an order.
+
+    ``revision`` counts the shipping cost changes made while something
+    observes the shipping, such as the invoice it belongs to.
     """
+    __slots__ = ("order", "ship_date", "_ship_cost_cents", "is_urgent", "revision")
     count_urgent = 0
+    _count_lock = threading.Lock()
+    rate_engine = RateEngine(DEFAULT_RATES)
 
     def __init__(self, order: Order, ship_date):
+        self._observers = None
         self.order = order
         self.ship_date = ship_date
-        self.ship_cost = 0.0
+        self._ship_cost_cents = 0
+        self.is_urgent = False
+        self.revision = 0
+
+    @property
+    def ship_cost_cents(self) -> int:
+        return self._ship_cost_cents
+
+    @ship_cost_cents.setter
+    def ship_cost_cents(self, value: int):
+        if self._observers is None:
+            self._ship_cost_cents = value
+        elif value != self._ship_cost_cents:
+            self._ship_cost_cents = value
+            self.revision += 1
+            self._changed()
+
+    @property
+    def ship_cost(self) -> float:
+        return self._ship_cost_cents / 100
+
+    @ship_cost.setter
+    def ship_cost(self, value: float):
+        self.ship_cost_cents = to_cents(value)
 
     def set_ship_cost(self, cost: float):
         """
@@ -151,10 +594,23 @@ class Shipping:
         """
         self.ship_cost = cost
 
-    def calc_ship_cost(self, is_urgent: bool) -> float:
+    @classmethod
+    def add_urgent(cls, count: int):
+        """
+        Adds to the urgent shipping counter, safely across threads.
+        """
+        with cls._count_lock:
+            cls.count_urgent += count
+
+    def calc_ship_cost(self, is_urgent: bool, zone: str = DEFAULT_ZONE, weight: float = 0.0,
+                       carrier: str = None) -> float:
         """
         Calculates the shipping cost based on urgency.
 
+        The cost is quoted by ``Shipping.rate_engine``; replace it with a
+        ``RateEngine`` over your own ``RateTable`` to price by zone, weight
+        and carrier.
+
         Examples:
             >>> from datetime import date
             >>> customer = Customer("Alice", "1234567890", "alice@example.com")
@@ -164,18 +620,25 @@ class Shipping:
             >>> shipping.calc_ship_cost(True)
             5.45
         """
-        if is_urgent:
-            self.ship_cost = 5.45
-            Shipping.count_urgent += 1
-        else:
-            self.ship_cost = 3.95
+        self.is_urgent = bool(is_urgent)
+        self.ship_cost = self.rate_engine.quote(zone, weight, self.is_urgent, carrier)
+        if self.is_urgent:
+            Shipping.add_urgent(1)
         return self.ship_cost
 
 
-class Invoice:
+class Invoice(Observable):
     """
     Represents an invoice for an order.
+
+    ``stock`` is the order's current first book (the constructor argument is
+    kept for compatibility); the total covers every line.  The
+    total is computed on first use and cached; the invoice observes its
+    order and shipping, so a new price, quantity or shipping cost drops the
+    cached total and is passed on to the invoice's own observers.
     """
+    __slots__ = ("invoice_nbr", "ship_order", "_total_cents")
+
     def __init__(self, invoice_nbr: str, stock: Stock, ship_order: Shipping):
         """
         Examples:
@@ -188,25 +651,129 @@ class Invoice:
             >>> invoice = Invoice("INV001", stock, shipping)
             >>> invoice.invoice()
             12.94
+            >>> stock.price = 9.99
+            >>> invoice.total_cost
+            13.94
         """
+        self._observers = None
         self.invoice_nbr = invoice_nbr
-        self.stock = stock
         self.ship_order = ship_order
-        self.total_cost = 0.0
+        self._total_cents = None
+        self._watch()
+
+    @property
+    def stock(self) -> Stock:
+        return self.ship_order.order.stock
+
+    @property
+    def total_cents(self) -> int:
+        cents = self._total_cents
+        if cents is None:
+            # Checked like the order's subtotal, but against the lines
+            # themselves, as the order's cached subtotal may be the one
+            # that is out of date.
+            cents = self._total_cents = _invoice_cents(self)
+            fresh = self._sum()
+            if fresh != cents:
+                self._total_cents = None
+                cents = fresh
+        return cents
+
+    @property
+    def total_cost(self) -> float:
+        return self.total_cents / 100
 
     def invoice(self) -> float:
         """
-        Calculates the total cost of the invoice.
+        Retrieves the total cost of the invoice, exactly in cents.
+        """
+        return self.total_cents / 100
+
+    def changed(self, source):
+        """
+        Drops the cached total and tells the invoice's observers.
         """
-        self.total_cost = round(self.stock.price + self.ship_order.ship_cost, 2)
-        return self.total_cost
+        self._total_cents = None
+        self._changed()
+
+    def _sum(self) -> int:
+        # The total from the current lines and shipping cost, bypassing
+        # every cache.
+        shipping = self.ship_order
+        return shipping.order._sum() + shipping.ship_cost_cents
+
+    def _watch(self):
+        shipping = self.ship_order
+        order = shipping.order
+        if shipping._observers is None and order._observers is None:
+            # Both fresh, as when built for this invoice: no lock is needed
+            # and one weak reference serves both.
+            shipping._observers = order._observers = weakref.ref(self)
+        else:
+            shipping.subscribe(self)
+            order.subscribe(self)
 
 class BookStore:
     """
     Represents a repository for storing and managing invoices.
+
+    Invoices are kept in a dict keyed by ``invoice_nbr`` so lookups, removals
+    and replacements are O(1).  Secondary indexes by customer email and by
+    book make per-customer and per-book queries O(k) in the number of
+    matching invoices.  The secondary keys (email, urgency, ship date) are
+    captured when the invoice is added and the captured keys are used to
+    remove it, so editing them later cannot leave the indexes or aggregates
+    out of step.
+
+    Revenue aggregates (overall, by urgency, per customer, per book, per ship
+    day and month) are kept in integer cents and updated on every add and
+    removal, so statistics cost O(1) regardless of history size.  For a
+    multi-book order each book is credited its line amount and the first
+    book the shipping, following the order's current lines.  The repository
+    observes its invoices, so when a price, a line or a shipping cost
+    changes only the affected invoice is re-credited.  Given a ``lock``, as
+    each shard of ``ConcurrentBookStore`` is, the repository holds it while
+    re-crediting.
+
+    Sorted orders for ``view`` are indexes of ``(key, invoice_nbr)`` pairs,
+    one per entry of ``SORT_KEYS``, built on first use and then kept sorted
+    as invoices come and go.
     """
-    def __init__(self):
-        self.invoices = []
+    SORT_KEYS = {
+        "invoice_nbr": lambda invoice: (len(invoice.invoice_nbr), invoice.invoice_nbr),
+        "customer": lambda invoice: invoice.ship_order.order.customer.name.casefold(),
+        "book": lambda invoice: invoice.stock.name.casefold() if invoice.stock else "",
+        "ship_date": lambda invoice: invoice.ship_order.ship_date,
+        "urgent": lambda invoice: invoice.ship_order.is_urgent,
+        "total": lambda invoice: invoice.total_cents,
+    }
+
+    def __init__(self, lock=None):
+        self._invoices = {}
+        self._by_customer = {}
+        self._by_stock = {}
+        self._next_invoice = 1
+        self._entries = {}
+        self._books = {}
+        self._revenue_cents = 0
+        self._urgent_count = 0
+        self._customer_cents = {}
+        self._stock_cents = {}
+        self._daily = {}
+        self._monthly = {}
+        self._sorted = {}
+        # Told of changes to stored invoices.
+        self._observer = self if lock is None else _LockedObserver(self, lock)
+
+    def __len__(self) -> int:
+        return len(self._invoices)
+
+    def __contains__(self, invoice_nbr) -> bool:
+        return invoice_nbr in self._invoices
+
+    @property
+    def invoices(self) -> list:
+        return list(self._invoices.values())
 
     @property
     def get_invoices(self) -> list:
@@ -218,18 +785,754 @@ class BookStore:
     def add_invoice(self, invoice):
         """
         Adds an invoice to the repository.
+
+        Examples:
+            >>> from datetime import date
+            >>> customer = Customer("Alice", "1234567890", "alice@example.com")
+            >>> stock = Stock("1984", "George Orwell", 8.99)
+            >>> shipping = Shipping(Order(customer, stock), date(2025, 1, 1))
+            >>> bookstore = BookStore()
+            >>> bookstore.add_invoice(Invoice("INV001", stock, shipping))
+            >>> bookstore.add_invoice(Invoice("INV001", stock, shipping))
+            Traceback (most recent call last):
+            ...
+            ValueError: Duplicate invoice number: INV001
+        """
+        if invoice.invoice_nbr in self._invoices:
+            raise ValueError(f"Duplicate invoice number: {invoice.invoice_nbr}")
+        self._invoices[invoice.invoice_nbr] = invoice
+        invoice.subscribe(self._observer)
+        self._index(invoice)
+        self._sort_add([invoice])
+
+    def allocate_invoice_nbrs(self, count: int = 1) -> list:
+        """
+        Reserves a block of consecutive unused invoice numbers.
+
+        Examples:
+            >>> BookStore().allocate_invoice_nbrs(2)
+            ['INV0001', 'INV0002']
+        """
+        numbers = []
+        seq = self._next_invoice
+        while len(numbers) < count:
+            invoice_nbr = format_invoice_nbr(seq)
+            seq += 1
+            if invoice_nbr not in self._invoices:
+                numbers.append(invoice_nbr)
+        self._next_invoice = seq
+        return numbers
+
+    def place_orders(self, batch, inventory=None) -> list:
         """
-        self.invoices.append(invoice)
+        Places a batch of orders and returns their invoices.
+
+        Each item of the batch is a ``(customer, books, is_urgent, ship_date)``
+        tuple, where ``books`` is one Stock or a list of ``(stock, quantity)``
+        pairs; each item becomes one order with one shipment and one invoice.
+        An item may go on with the ``zone``, ``weight`` and ``carrier`` its
+        shipment is quoted for, as in ``calc_ship_cost``.
+        Invoice numbers are allocated as one block, shipping and invoice
+        totals are priced in a single pass and the invoices are added to the
+        repository together.  With an ``inventory`` (see
+        ``bookstore_inventory.Inventory``) every copy ordered is reserved up
+        front and committed once the invoices are stored; if any copy is
+        unavailable the whole batch is rejected with ValueError.
+
+        Examples:
+            >>> from datetime import date
+            >>> customer = Customer("Alice", "1234567890", "alice@example.com")
+            >>> stock = Stock("1984", "George Orwell", 8.99)
+            >>> bookstore = BookStore()
+            >>> invoices = bookstore.place_orders([
+            ...     (customer, stock, False, date(2025, 1, 1)),
+            ...     (customer, stock, True, date(2025, 1, 2)),
+            ... ])
+            >>> [(inv.invoice_nbr, inv.total_cost) for inv in invoices]
+            [('INV0001', 12.94), ('INV0002', 14.44)]
+            >>> cart, = bookstore.place_orders([(customer, [(stock, 3)], False, date(2025, 1, 3))])
+            >>> cart.total_cost
+            30.92
+        """
+        batch = list(batch)
+        with self.reserved(inventory, batch):
+            invoices = self.price_orders(self.allocate_invoice_nbrs(len(batch)), batch)
+            self.store_invoices(invoices)
+        return invoices
+
+    @staticmethod
+    def price_orders(invoice_nbrs, batch) -> list:
+        """
+        Prices a batch of orders into invoices numbered ``invoice_nbrs``.
+
+        The batch is as for ``place_orders``; the invoices are not stored.
+        """
+        invoices = []
+        urgent = 0
+        costs = Shipping.rate_engine.quote_many(
+            (DEFAULT_ZONE, 0.0, bool(item[2])) if len(item) == 4 else _quote_request(item) for item in batch)
+        for invoice_nbr, item, cost in zip(invoice_nbrs, batch, costs):
+            customer, books, is_urgent, ship_date = item[:4]
+            if isinstance(books, Stock):
+                order = Order(customer, books)
+            else:
+                order = Order.from_lines(customer, books)
+                if not order.lines:
+                    raise ValueError("An order needs at least one book.")
+            shipping = Shipping(order, ship_date)
+            shipping.ship_cost_cents = to_cents(cost)
+            if is_urgent:
+                shipping.is_urgent = True
+                urgent += 1
+            invoices.append(Invoice(invoice_nbr, order.stock, shipping))
+        Shipping.add_urgent(urgent)
+        return invoices
+
+    @staticmethod
+    @contextmanager
+    def reserved(inventory, batch: list):
+        """
+        Reserves every copy a batch orders for the duration of a with block.
+
+        The copies are committed when the block completes and released if it
+        raises.  Without an ``inventory`` nothing is reserved.
+        """
+        if inventory is None:
+            yield
+            return
+        reservations = inventory.reserve_all(
+            line for item in batch for line in _book_lines(item[1]))
+        try:
+            yield
+        except BaseException:
+            inventory.release_all(reservations)
+            raise
+        inventory.commit_all(reservations)
+
+    def remove_invoice(self, invoice_nbr: str):
+        """
+        Removes an invoice by its number and returns it, or None if absent.
+        """
+        invoice = self._invoices.pop(invoice_nbr, None)
+        if invoice is not None:
+            self._sort_remove(invoice, self._unindex(invoice))
+            invoice.unsubscribe(self._observer)
+        return invoice
+
+    def replace_invoice(self, invoice):
+        """
+        Stores an invoice in place of any invoice with the same number.
+
+        Returns the replaced invoice, or None if the number was new.
+
+        Examples:
+            >>> from datetime import date
+            >>> customer = Customer("Alice", "1234567890", "alice@example.com")
+            >>> stock = Stock("1984", "George Orwell", 8.99)
+            >>> shipping = Shipping(Order(customer, stock), date(2025, 1, 1))
+            >>> bookstore = BookStore()
+            >>> bookstore.add_invoice(Invoice("INV001", stock, shipping))
+            >>> old = bookstore.replace_invoice(Invoice("INV001", stock, shipping))
+            >>> old.invoice_nbr, len(bookstore)
+            ('INV001', 1)
+        """
+        old = self.remove_invoice(invoice.invoice_nbr)
+        self.add_invoice(invoice)
+        return old
 
     def search_invoice(self, invoice_nbr: str):
         """
         Searches for an invoice in the repository by its number.
         """
-        for invoice in self.invoices:
-            if invoice.invoice_nbr == invoice_nbr:
-                return invoice
-        return None
+        return self._invoices.get(invoice_nbr)
+
+    def invoices_for_customer(self, email: str) -> list:
+        """
+        Retrieves the invoices of the customer with the given email.
+
+        Examples:
+            >>> from datetime import date
+            >>> customer = Customer("Alice", "1234567890", "alice@example.com")
+            >>> stock = Stock("1984", "George Orwell", 8.99)
+            >>> shipping = Shipping(Order(customer, stock), date(2025, 1, 1))
+            >>> bookstore = BookStore()
+            >>> bookstore.add_invoice(Invoice("INV001", stock, shipping))
+            >>> [inv.invoice_nbr for inv in bookstore.invoices_for_customer("alice@example.com")]
+            ['INV001']
+            >>> bookstore.invoices_for_customer("bob@example.com")
+            []
+        """
+        return list(self._by_customer.get(email, {}).values())
+
+    def invoices_for_stock(self, stock) -> list:
+        """
+        Retrieves the invoices that include the given book.
+        """
+        return list(self._by_stock.get(stock, {}).values())
+
+    def view(self, sort_by: str = None, descending: bool = False, email: str = None,
+             stock=None) -> "InvoiceView":
+        """
+        Opens a sorted, optionally filtered window over the invoices.
+
+        ``sort_by`` names one of ``SORT_KEYS``; None keeps insertion order.
+        The unfiltered orders come straight from the sorted indexes, so
+        paging never re-sorts the repository.  Filtering by customer email
+        and/or book starts from the secondary indexes and sorts only the
+        matching invoices.
+
+        Examples:
+            >>> from datetime import date
+            >>> alice = Customer("Alice", "1234567890", "alice@example.com")
+            >>> bob = Customer("Bob", "9876543210", "bob@example.com")
+            >>> stock = Stock("1984", "George Orwell", 8.99)
+            >>> bookstore = BookStore()
+            >>> _ = bookstore.place_orders([(alice, stock, True, date(2025, 1, 1)),
+            ...                             (bob, stock, False, date(2025, 1, 2)),
+            ...                             (alice, stock, False, date(2025, 1, 3))])
+            >>> view = bookstore.view("total", descending=True)
+            >>> len(view), [inv.invoice_nbr for inv in view.page(0, 2)]
+            (3, ['INV0001', 'INV0003'])
+            >>> [inv.invoice_nbr for inv in bookstore.view("ship_date", email="alice@example.com").page(1, 10)]
+            ['INV0003']
+        """
+        if sort_by is not None and sort_by not in self.SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort_by}")
+        if email is None and stock is None:
+            if sort_by is None:
+                return InvoiceView(self._invoices, list(self._invoices), descending)
+            return InvoiceView(self._invoices, list(self._sort_index(sort_by)), descending, keyed=True)
+        buckets = []
+        if email is not None:
+            buckets.append(self._by_customer.get(email, {}))
+        if stock is not None:
+            buckets.append(self._by_stock.get(stock, {}))
+        buckets.sort(key=len)
+        first, *rest = buckets
+        matches = [invoice for nbr, invoice in first.items() if all(nbr in bucket for bucket in rest)]
+        if sort_by is None:
+            return InvoiceView(self._invoices, [invoice.invoice_nbr for invoice in matches], descending)
+        key = self.SORT_KEYS[sort_by]
+        entries = sorted((key(invoice), invoice.invoice_nbr) for invoice in matches)
+        return InvoiceView(self._invoices, entries, descending, keyed=True)
+
+    def changed(self, invoice):
+        """
+        Re-credits an invoice whose total or lines changed after it was added.
+
+        Only the aggregates and book index are updated in place, in O(lines).
+        The ``total`` and ``book`` sort indexes are dropped and rebuilt on
+        next use, so repricing a book in k invoices costs O(k) rather than
+        an O(n) sorted-list update per invoice.
+
+        Examples:
+            >>> from datetime import date
+            >>> customer = Customer("Alice", "1234567890", "alice@example.com")
+            >>> stock = Stock("1984", "George Orwell", 8.99)
+            >>> bookstore = BookStore()
+            >>> _ = bookstore.place_orders([(customer, stock, False, date(2025, 1, 1))] * 2)
+            >>> stock.price = 10.99
+            >>> bookstore.revenue, bookstore.stock_revenue(stock)
+            (29.88, 29.88)
+        """
+        if self._invoices.get(invoice.invoice_nbr) is invoice:
+            self._index(invoice, self._unindex(invoice))
+            self._sorted.pop("total", None)
+            self._sorted.pop("book", None)
+
+    def store_invoices(self, invoices: list):
+        """
+        Adds priced invoices together, as ``place_orders`` does.
+
+        If any invoice number is already taken, none of the invoices is added
+        and ValueError is raised.
+        """
+        for invoice in invoices:
+            if invoice.invoice_nbr in self._invoices:
+                raise ValueError(f"Duplicate invoice number: {invoice.invoice_nbr}")
+        self._invoices.update((invoice.invoice_nbr, invoice) for invoice in invoices)
+        for invoice in invoices:
+            invoice.subscribe(self._observer)
+            self._index(invoice)
+        self._sort_add(invoices)
+
+    @property
+    def revenue(self) -> float:
+        """
+        Retrieves the total of every invoice.
+        """
+        return self._revenue_cents / 100
+
+    @property
+    def revenue_cents(self) -> int:
+        """
+        Retrieves the total of every invoice in cents.
+        """
+        return self._revenue_cents
+
+    def stats(self) -> dict:
+        """
+        Summarizes the invoices: count, revenue, urgent share, average basket.
+
+        Examples:
+            >>> from datetime import date
+            >>> customer = Customer("Alice", "1234567890", "alice@example.com")
+            >>> stock = Stock("1984", "George Orwell", 8.99)
+            >>> bookstore = BookStore()
+            >>> _ = bookstore.place_orders([(customer, stock, False, date(2025, 1, 1)),
+            ...                             (customer, stock, True, date(2025, 1, 2))])
+            >>> bookstore.stats()
+            {'count': 2, 'revenue': 27.38, 'urgent': 1, 'urgent_share': 0.5, 'average_basket': 13.69}
+            >>> _ = bookstore.remove_invoice("INV0001")
+            >>> bookstore.stats()["revenue"]
+            14.44
+        """
+        return self.summarize([self.tally()])
+
+    def tally(self) -> tuple:
+        """
+        Retrieves ``(invoice count, urgent count, revenue in cents)``.
+        """
+        return len(self._invoices), self._urgent_count, self._revenue_cents
+
+    @staticmethod
+    def summarize(tallies) -> dict:
+        """
+        Combines ``tally`` results, such as one per shard, into a ``stats`` summary.
+
+        Examples:
+            >>> BookStore.summarize([(2, 1, 2738), (1, 0, 1294)])["average_basket"]
+            13.44
+        """
+        count = urgent = cents = 0
+        for tally_count, tally_urgent, tally_cents in tallies:
+            count += tally_count
+            urgent += tally_urgent
+            cents += tally_cents
+        return {
+            "count": count,
+            "revenue": cents / 100,
+            "urgent": urgent,
+            "urgent_share": urgent / count if count else 0.0,
+            "average_basket": round(cents / count) / 100 if count else 0.0,
+        }
+
+    def customer_revenue(self, email: str) -> float:
+        """
+        Retrieves the total spent by the customer with the given email.
+        """
+        return self.customer_revenue_cents(email) / 100
+
+    def customer_revenue_cents(self, email: str) -> int:
+        """
+        Retrieves the total spent by the customer with the given email, in cents.
+        """
+        return self._customer_cents.get(email, 0)
+
+    def stock_revenue(self, stock) -> float:
+        """
+        Retrieves the total of the invoices that include the given book.
+        """
+        return self.stock_revenue_cents(stock) / 100
+
+    def stock_revenue_cents(self, stock) -> int:
+        """
+        Retrieves the total of the invoices that include the given book, in cents.
+        """
+        return self._stock_cents.get(stock, 0)
+
+    def daily_revenue(self, ship_date) -> tuple:
+        """
+        Retrieves ``(invoice count, revenue)`` for one ship date.
+        """
+        count, cents = self._daily.get(ship_date, (0, 0))
+        return count, cents / 100
+
+    def monthly_revenue(self, year: int, month: int) -> tuple:
+        """
+        Retrieves ``(invoice count, revenue)`` for one ship month.
+        """
+        count, cents = self._monthly.get((year, month), (0, 0))
+        return count, cents / 100
+
+    def _sort_index(self, sort_by: str) -> list:
+        index = self._sorted.get(sort_by)
+        if index is None:
+            key = self.SORT_KEYS[sort_by]
+            index = self._sorted[sort_by] = sorted(
+                (key(invoice), nbr) for nbr, invoice in self._invoices.items())
+        return index
+
+    def _sort_add(self, invoices: list):
+        for sort_by, index in self._sorted.items():
+            key = self.SORT_KEYS[sort_by]
+            if len(invoices) == 1:
+                insort(index, (key(invoices[0]), invoices[0].invoice_nbr))
+            else:
+                # One merge of the sorted runs instead of an O(n) insert each.
+                index.extend((key(invoice), invoice.invoice_nbr) for invoice in invoices)
+                index.sort()
+
+    def _sort_remove(self, invoice, entry: tuple):
+        _, cents, is_urgent, ship_date = entry
+        captured = {"total": cents, "urgent": is_urgent, "ship_date": ship_date}
+        for sort_by, index in list(self._sorted.items()):
+            key = captured[sort_by] if sort_by in captured else self.SORT_KEYS[sort_by](invoice)
+            entry = (key, invoice.invoice_nbr)
+            i = bisect_left(index, entry)
+            if i < len(index) and index[i] == entry:
+                del index[i]
+            else:
+                # The key changed since the invoice was added; rebuild on next use.
+                del self._sorted[sort_by]
+
+    def _index(self, invoice, captured: tuple = None):
+        # ``captured`` is the entry of an invoice being re-credited, whose
+        # keys stay as they were when it was first added.
+        if captured is None:
+            shipping = invoice.ship_order
+            captured = (shipping.order.customer.email, 0, shipping.is_urgent, shipping.ship_date)
+        email, _, is_urgent, ship_date = captured
+        self._by_customer.setdefault(email, {})[invoice.invoice_nbr] = invoice
+        # Summed afresh rather than read from the invoice's cache, which a
+        # fill on another thread may hold out of date for a moment.  The sum
+        # is cached in turn: a change racing with it reaches this repository
+        # through the invoice, and is re-credited with a new sum.
+        cents = invoice._total_cents = invoice._sum()
+        shares = _stock_shares(invoice.ship_order.order, cents)
+        for stock, _ in shares:
+            self._by_stock.setdefault(stock, {})[invoice.invoice_nbr] = invoice
+        # A single book is kept bare rather than as a one-share tuple, and
+        # apart from the entry, whose atomic fields let the collector stop
+        # tracking it.
+        self._books[invoice.invoice_nbr] = shares[0][0] if len(shares) == 1 else shares
+        entry = (email, cents, is_urgent, ship_date)
+        self._entries[invoice.invoice_nbr] = entry
+        self._aggregate(entry, shares, 1)
+
+    def _unindex(self, invoice):
+        entry = self._entries.pop(invoice.invoice_nbr)
+        books = self._books.pop(invoice.invoice_nbr)
+        email, cents, _, _ = entry
+        _discard(self._by_customer, email, invoice.invoice_nbr)
+        shares = books if type(books) is tuple else ((books, cents),)
+        for stock, _ in shares:
+            _discard(self._by_stock, stock, invoice.invoice_nbr)
+        self._aggregate(entry, [(stock, -share) for stock, share in shares], -1)
+        return entry
+
+    def _aggregate(self, entry: tuple, shares, count: int):
+        # Adds (count 1) or takes back (count -1) an invoice's captured entry.
+        email, cents, is_urgent, ship_date = entry
+        cents *= count
+        self._revenue_cents += cents
+        if is_urgent:
+            self._urgent_count += count
+        _bump(self._customer_cents, email, cents)
+        for stock, share in shares:
+            _bump(self._stock_cents, stock, share)
+        _bump_bucket(self._daily, ship_date, count, cents)
+        _bump_bucket(self._monthly, (ship_date.year, ship_date.month), count, cents)
+
+
+class _LockedObserver:
+    # Forwards invoice changes to a repository while holding its lock.
+    __slots__ = ("_bookstore", "_lock", "__weakref__")
+
+    def __init__(self, bookstore: BookStore, lock):
+        self._bookstore = bookstore
+        self._lock = lock
+
+    def changed(self, invoice):
+        with self._lock:
+            self._bookstore.changed(invoice)
+
+
+class InvoiceView:
+    """
+    Represents a read-only window over invoices in a fixed order.
+
+    The view holds invoice numbers only and ``page`` resolves just the
+    requested rows, skipping invoices removed since the view was opened.
+    """
+    __slots__ = ("_invoices", "_entries", "_descending", "_keyed")
+
+    def __init__(self, invoices: dict, entries: list, descending: bool = False, keyed: bool = False):
+        self._invoices = invoices
+        self._entries = entries
+        self._descending = descending
+        self._keyed = keyed
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def page(self, offset: int, limit: int) -> list:
+        """
+        Retrieves up to limit invoices starting at row offset.
+        """
+        offset = max(offset, 0)
+        if self._descending:
+            stop = max(len(self._entries) - offset, 0)
+            entries = self._entries[max(stop - limit, 0):stop][::-1]
+        else:
+            entries = self._entries[offset:offset + limit]
+        if self._keyed:
+            entries = [nbr for _, nbr in entries]
+        invoices = self._invoices
+        return [invoices[nbr] for nbr in entries if nbr in invoices]
+
+
+class LatencyHistogram:
+    """
+    Counts latencies into fixed, roughly logarithmic buckets.
+
+    Examples:
+        >>> histogram = LatencyHistogram()
+        >>> for seconds in (0.0002, 0.0004, 0.0004, 0.003):
+        ...     histogram.record(seconds)
+        >>> histogram.count, histogram.percentile(50), histogram.percentile(99)
+        (4, 0.0005, 0.005)
+    """
+    BOUNDS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+              0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, bounds: tuple = BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds: float):
+        """
+        Adds one latency sample.
+        """
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, p: float) -> float:
+        """
+        Returns the upper bound of the bucket holding the p-th percentile.
+        """
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        """
+        Summarizes the histogram for reporting.
+        """
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+        }
+
+
+class OrderPipeline:
+    """
+    Processes orders through asyncio stages connected by bounded queues.
+
+    The stages are ``validate`` (customer, book and ship date),
+    ``ship`` (build the Shipping and price it), ``invoice`` (number and
+    total the Invoice) and ``persist`` (add it to the BookStore).  Each stage
+    runs ``concurrency[stage]`` workers, and every queue holds at most
+    ``queue_size`` orders, so ``submit`` waits when the pipeline is full.
+    ``histograms`` holds a LatencyHistogram of service time per stage plus
+    ``total`` for submit-to-invoice latency.  A subclass may override a
+    stage handler with a coroutine (for example to persist to a remote
+    store); that is where more than one worker per stage pays off.
+
+    Examples:
+        >>> from datetime import date
+        >>> async def run(bookstore):
+        ...     customer = Customer("Alice", "1234567890", "alice@example.com")
+        ...     stock = Stock("1984", "George Orwell", 8.99)
+        ...     async with OrderPipeline(bookstore, {"persist": 2}) as pipeline:
+        ...         invoice = await pipeline.place_order(customer, stock, True, date(2025, 1, 1))
+        ...     return invoice.invoice(), pipeline.histograms["total"].count
+        >>> bookstore = BookStore()
+        >>> asyncio.run(run(bookstore))
+        (14.44, 1)
+        >>> len(bookstore)
+        1
+    """
+    STAGES = ("validate", "ship", "invoice", "persist")
+
+    def __init__(self, bookstore, concurrency: dict = None, queue_size: int = 100):
+        self.bookstore = bookstore
+        self.concurrency = dict.fromkeys(self.STAGES, 1)
+        self.concurrency.update(concurrency or {})
+        self.queue_size = queue_size
+        self.histograms = {stage: LatencyHistogram() for stage in self.STAGES + ("total",)}
+        self._queues = []
+        self._workers = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def start(self):
+        """
+        Creates the stage queues and starts the workers.
+        """
+        self._queues = [asyncio.Queue(self.queue_size) for _ in self.STAGES]
+        handlers = (self._validate, self._ship, self._invoice, self._persist)
+        for i, (stage, handler) in enumerate(zip(self.STAGES, handlers)):
+            outbox = self._queues[i + 1] if i + 1 < len(self.STAGES) else None
+            for _ in range(self.concurrency[stage]):
+                self._workers.append(asyncio.create_task(
+                    self._work(self._queues[i], outbox, handler, self.histograms[stage])))
+
+    async def stop(self):
+        """
+        Waits for queued orders to finish, then stops the workers.
+        """
+        for queue in self._queues:
+            await queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, customer, stock, is_urgent: bool, ship_date, zone: str = DEFAULT_ZONE,
+                     weight: float = 0.0, carrier: str = None) -> asyncio.Future:
+        """
+        Queues an order, waiting while the first stage is full.
+
+        ``zone``, ``weight`` and ``carrier`` are passed on to
+        ``Shipping.calc_ship_cost``.  Returns a future that resolves to the Invoice, or to the exception
+        that rejected the order (a ValueError) or that a stage raised.
+        """
+        future = asyncio.get_running_loop().create_future()
+        job = {"future": future, "started": time.perf_counter(), "customer": customer,
+               "stock": stock, "is_urgent": is_urgent, "ship_date": ship_date,
+               "zone": zone, "weight": weight, "carrier": carrier}
+        await self._queues[0].put(job)
+        return future
+
+    async def place_order(self, customer, stock, is_urgent: bool, ship_date, zone: str = DEFAULT_ZONE,
+                          weight: float = 0.0, carrier: str = None) -> "Invoice":
+        """
+        Submits an order and waits for its invoice.
+        """
+        return await (await self.submit(customer, stock, is_urgent, ship_date, zone, weight, carrier))
+
+    async def _work(self, inbox, outbox, handler, histogram):
+        while True:
+            job = await inbox.get()
+            try:
+                if not job["future"].done():
+                    start = time.perf_counter()
+                    try:
+                        result = handler(job)
+                        if inspect.isawaitable(result):
+                            await result
+                    except Exception as e:
+                        # Any failure settles this order; the worker moves on.
+                        if not job["future"].done():
+                            job["future"].set_exception(e)
+                    histogram.record(time.perf_counter() - start)
+                    if outbox is not None and not job["future"].done():
+                        await outbox.put(job)
+            finally:
+                inbox.task_done()
+
+    def _validate(self, job: dict):
+        if not isinstance(job["customer"], Customer):
+            raise ValueError("Invalid customer.")
+        if not isinstance(job["stock"], Stock):
+            raise ValueError("Invalid book.")
+        if not isinstance(job["ship_date"], date):
+            raise ValueError("Invalid ship date.")
+
+    def _ship(self, job: dict):
+        shipping = Shipping(Order(job["customer"], job["stock"]), job["ship_date"])
+        shipping.calc_ship_cost(job["is_urgent"], job["zone"], job["weight"], job["carrier"])
+        job["shipping"] = shipping
+
+    def _invoice(self, job: dict):
+        invoice_nbr, = self.bookstore.allocate_invoice_nbrs(1)
+        invoice = Invoice(invoice_nbr, job["stock"], job["shipping"])
+        invoice.invoice()
+        job["invoice"] = invoice
+
+    def _persist(self, job: dict):
+        self.bookstore.add_invoice(job["invoice"])
+        job["future"].set_result(job["invoice"])
+        self.histograms["total"].record(time.perf_counter() - job["started"])
+
+
+def _quote_request(item) -> tuple:
+    if len(item) > 7:
+        raise ValueError("An order has at most zone, weight and carrier after its ship date.")
+    zone, weight, carrier = tuple(item[4:]) + (DEFAULT_ZONE, 0.0, None)[len(item) - 4:]
+    return zone, weight, bool(item[2]), carrier
+
+
+def _book_lines(books) -> tuple:
+    if isinstance(books, Stock):
+        return ((books, 1),)
+    return tuple(books)
+
+
+@functools.cache
+def _state_slots(cls: type) -> tuple:
+    # The slots pickled for an Observable: every slot in the class hierarchy
+    # except the observer set and the weak reference slot.
+    return tuple(name for klass in reversed(cls.__mro__) for name in klass.__dict__.get("__slots__", ())
+                 if name not in ("_observers", "__weakref__"))
+
+
+def _invoice_cents(invoice) -> int:
+    shipping = invoice.ship_order
+    return shipping.order.subtotal_cents + shipping.ship_cost_cents
+
+
+def _stock_shares(order, cents: int) -> tuple:
+    # Splits an invoice total by book: each line's amount, with shipping
+    # credited to the first book.  An order without lines credits nobody.
+    lines = order._lines
+    if len(lines) <= 1:
+        return ((lines[0].stock, cents),) if lines else ()
+    shares = [(line.stock, line.stock.price_cents * line.quantity) for line in lines]
+    first, share = shares[0]
+    shares[0] = (first, share + cents - sum(share for _, share in shares))
+    return tuple(shares)
+
+
+def _bump(totals: dict, key, cents: int):
+    total = totals.get(key, 0) + cents
+    if total:
+        totals[key] = total
+    else:
+        totals.pop(key, None)
+
+
+def _bump_bucket(buckets: dict, key, count: int, cents: int):
+    old_count, old_cents = buckets.get(key, (0, 0))
+    if old_count + count or old_cents + cents:
+        buckets[key] = (old_count + count, old_cents + cents)
+    else:
+        buckets.pop(key, None)
+
 
+def _discard(index: dict, key, invoice_nbr: str):
+    bucket = index.get(key)
+    if bucket is not None:
+        bucket.pop(invoice_nbr, None)
+        if not bucket:
+            del index[key]
 
 
 if __name__ == "__main__":
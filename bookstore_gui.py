@@ -1,23 +1,57 @@
 import tkinter as tk
-from tkinter import messagebox
-from bookstore_core import Customer, Stock, Order, Shipping, Invoice, BookStore
+from tkinter import filedialog, messagebox, ttk
+from bookstore_catalog import Typeahead
+from bookstore_core import Customer, Stock, BookStore
+from bookstore_import import import_stocks
+from bookstore_registry import CustomerRegistry, StockRegistry
+from bookstore_storage import StorageEngine
+from bookstore_tasks import TaskRunner
 from datetime import date
 
 class BookstoreApp:
-    def __init__(self, root):
+    def __init__(self, root, storage=None):
         self.root = root
         self.root.title("Book Ordering System")
 
-        # this is the data repositories
-        self.customers = []
-        self.stocks = []
-        self.bookstore = BookStore()
+        # this is the data repositories, restored from storage when given
+        self.storage = storage
+        if storage is not None:
+            self.customers = storage.customers
+            self.stocks = storage.stocks
+            self.bookstore = storage.bookstore
+        else:
+            self.customers = CustomerRegistry()
+            self.stocks = StockRegistry()
+            self.bookstore = BookStore()
+
+        # Core operations run on a worker so the UI never waits on them
+        self.tasks = TaskRunner(root.after)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
 
         # Creates the UI elements
         self.create_customer_form()
         self.create_book_form()
         self.create_order_section()
         self.create_invoice_section()
+        self.create_status_bar()
+        self.update_menus()
+
+    def close(self):
+        self.tasks.close()
+        if self.storage is not None:
+            self.storage.close()
+        self.root.destroy()
+
+    def show_error(self, error):
+        messagebox.showerror("Error", str(error))
+
+    def create_status_bar(self):
+        frame = tk.Frame(self.root)
+        frame.pack(fill="x", pady=5)
+        self.progress = ttk.Progressbar(frame, mode="indeterminate", length=120)
+        self.progress.pack(side="left")
+        self.status = tk.Label(frame, anchor="w")
+        self.status.pack(side="left", fill="x")
 
     def create_customer_form(self):
         frame = tk.Frame(self.root)
@@ -48,14 +82,19 @@ class BookstoreApp:
 
         try:
             customer = Customer(name, phone, email)
-            self.customers.append(customer)
-            messagebox.showinfo("Success", "Customer added successfully")
-            self.customer_name.delete(0, tk.END)
-            self.customer_phone.delete(0, tk.END)
-            self.customer_email.delete(0, tk.END)
-            self.update_menus()  
         except ValueError as e:
             messagebox.showerror("Error", str(e))
+            return
+
+        save = self.storage.add_customer if self.storage is not None else self.customers.add
+        self.tasks.submit(save, customer, on_done=self.customer_added, on_error=self.show_error)
+
+    def customer_added(self, _):
+        messagebox.showinfo("Success", "Customer added successfully")
+        self.customer_name.delete(0, tk.END)
+        self.customer_phone.delete(0, tk.END)
+        self.customer_email.delete(0, tk.END)
+        self.update_menus()
 
     def create_book_form(self):
         frame = tk.Frame(self.root)
@@ -73,7 +112,12 @@ class BookstoreApp:
         self.book_price = tk.Entry(frame)
         self.book_price.grid(row=2, column=1)
 
-        tk.Button(frame, text="Add Book", command=self.add_book).grid(row=3, columnspan=2)
+        tk.Label(frame, text="ISBN (optional):").grid(row=3, column=0)
+        self.book_isbn = tk.Entry(frame)
+        self.book_isbn.grid(row=3, column=1)
+
+        tk.Button(frame, text="Add Book", command=self.add_book).grid(row=4, columnspan=2)
+        tk.Button(frame, text="Import Books...", command=self.import_books).grid(row=5, columnspan=2)
 
     def add_book(self):
         name = self.book_name.get()
@@ -87,58 +131,103 @@ class BookstoreApp:
         try:
             price = float(price)
             book = Stock(name, author, price)
-            self.stocks.append(book)
-            messagebox.showinfo("Success", "Book added to stock successfully")
-            self.book_name.delete(0, tk.END)
-            self.book_author.delete(0, tk.END)
-            self.book_price.delete(0, tk.END)
-            self.update_menus()  
         except ValueError:
             messagebox.showerror("Error", "Price must be a valid number")
+            return
+
+        try:
+            book.isbn = self.book_isbn.get().strip() or None
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+
+        save = self.storage.add_stock if self.storage is not None else self.stocks.add
+        self.tasks.submit(save, book, on_done=self.book_added, on_error=self.show_error)
+
+    def book_added(self, _):
+        messagebox.showinfo("Success", "Book added to stock successfully")
+        self.book_name.delete(0, tk.END)
+        self.book_author.delete(0, tk.END)
+        self.book_price.delete(0, tk.END)
+        self.book_isbn.delete(0, tk.END)
+        self.update_menus()
+
+    def import_books(self):
+        path = filedialog.askopenfilename(filetypes=[("Book feeds", "*.csv *.jsonl *.ndjson"), ("All files", "*")])
+        if not path:
+            return
+
+        def save(books):
+            add = self.storage.add_stock if self.storage is not None else self.stocks.add
+            for book in books:
+                add(book)
+
+        self.progress.start()
+        self.status.config(text="Importing books...")
+        self.tasks.run_batch(save, import_stocks(path, path + ".rejects.jsonl"),
+                             on_progress=self.import_progress, on_done=self.import_finished,
+                             on_error=self.import_failed)
+
+    def import_progress(self, progress):
+        done, _ = progress
+        self.status.config(text=f"Importing books... {done:,} so far")
+
+    def import_finished(self, count):
+        self.progress.stop()
+        self.status.config(text=f"Imported {count:,} books")
+        self.update_menus()
+
+    def import_failed(self, error):
+        self.progress.stop()
+        self.status.config(text="Import failed")
+        self.show_error(error)
 
     def create_order_section(self):
         frame = tk.Frame(self.root)
         frame.pack(pady=10)
 
         tk.Label(frame, text="Select Customer:").grid(row=0, column=0)
-        self.customer_menu = tk.StringVar()
-        self.customer_dropdown = tk.OptionMenu(frame, self.customer_menu, "")
-        self.customer_dropdown.grid(row=0, column=1)
+        self.customer_selector = Selector(frame, self.customers, lambda c: f"{c.name} <{c.email}>")
+        self.customer_selector.combobox.grid(row=0, column=1)
 
         tk.Label(frame, text="Select Book:").grid(row=1, column=0)
-        self.book_menu = tk.StringVar()
-        self.book_dropdown = tk.OptionMenu(frame, self.book_menu, "")
-        self.book_dropdown.grid(row=1, column=1)
+        self.book_selector = Selector(frame, self.stocks, book_label)
+        self.book_selector.combobox.grid(row=1, column=1)
 
-        tk.Label(frame, text="Urgent Shipping:").grid(row=2, column=0)
+        tk.Label(frame, text="Quantity:").grid(row=2, column=0)
+        self.quantity = tk.Spinbox(frame, from_=1, to=999, width=5)
+        self.quantity.grid(row=2, column=1, sticky="w")
+
+        tk.Label(frame, text="Urgent Shipping:").grid(row=3, column=0)
         self.is_urgent = tk.BooleanVar()
-        tk.Checkbutton(frame, variable=self.is_urgent).grid(row=2, column=1)
+        tk.Checkbutton(frame, variable=self.is_urgent).grid(row=3, column=1)
 
-        tk.Button(frame, text="Place Order", command=self.place_order).grid(row=3, columnspan=2)
+        tk.Button(frame, text="Place Order", command=self.place_order).grid(row=4, columnspan=2)
 
     def place_order(self):
-        customer_name = self.customer_menu.get()
-        book_name = self.book_menu.get()
-
-        if not customer_name or not book_name:
+        if not self.customer_selector.combobox.get() or not self.book_selector.combobox.get():
             messagebox.showerror("Error", "Select both a customer and a book")
             return
 
-        customer = next((c for c in self.customers if c.name == customer_name), None)
-        book = next((b for b in self.stocks if b.name == book_name), None)
+        customer = self.customer_selector.selected()
+        book = self.book_selector.selected()
 
         if not customer or not book:
             messagebox.showerror("Error", "Invalid customer or book selection")
             return
 
-        order = Order(customer, book)
-        shipping = Shipping(order, date.today())
-        shipping.set_ship_cost(shipping.calc_ship_cost(self.is_urgent.get()))
-        invoice = Invoice(f"INV{len(self.bookstore.get_invoices) + 1:04}", book, shipping)
+        try:
+            quantity = int(self.quantity.get())
+        except ValueError:
+            messagebox.showerror("Error", "Quantity must be a whole number")
+            return
+
+        orders = self.storage if self.storage is not None else self.bookstore
+        self.tasks.submit(orders.place_orders, [(customer, [(book, quantity)], self.is_urgent.get(), date.today())],
+                          on_done=self.order_placed, on_error=self.show_error)
 
-        self.bookstore.add_invoice(invoice)
-        messagebox.showinfo("Success", f"Order placed. Invoice Total: {invoice.invoice():.2f}")
-        self.update_menus()
+    def order_placed(self, invoices):
+        messagebox.showinfo("Success", f"Order placed. Invoice Total: {invoices[0].invoice():.2f}")
 
     def create_invoice_section(self):
         frame = tk.Frame(self.root)
@@ -158,36 +247,178 @@ class BookstoreApp:
             messagebox.showerror("Error", "Enter an invoice number")
             return
 
-        invoice = self.bookstore.search_invoice(invoice_nbr)
+        self.tasks.submit_latest("search", self.bookstore.search_invoice, invoice_nbr,
+                                 on_done=self.show_invoice)
+
+    def show_invoice(self, invoice):
         if invoice:
             messagebox.showinfo("Invoice Found", f"Invoice: {invoice.invoice_nbr}, Total: {invoice.invoice():.2f}")
         else:
             messagebox.showerror("Error", "Invoice not found")
 
     def view_all_invoices(self):
-        if not self.bookstore.get_invoices:
+        if not len(self.bookstore):
             messagebox.showinfo("Invoices", "No invoices available")
             return
 
-        invoices = "\n".join(f"{inv.invoice_nbr}: {inv.invoice():.2f}" for inv in self.bookstore.get_invoices)
-        messagebox.showinfo("All Invoices", invoices)
+        InvoiceBrowser(self.root, self.bookstore, self.tasks)
 
     def update_menus(self):
-        # Updated the customer menu
-        self.customer_dropdown['menu'].delete(0, 'end')
-        for customer in self.customers:
-            self.customer_dropdown['menu'].add_command(
-                label=customer.name, command=tk._setit(self.customer_menu, customer.name)
-            )
-
-        # Updated the book menu
-        self.book_dropdown['menu'].delete(0, 'end')
-        for book in self.stocks:
-            self.book_dropdown['menu'].add_command(
-                label=book.name, command=tk._setit(self.book_menu, book.name)
-            )
+        # Only the customers and books added since the last update are indexed
+        self.customer_selector.sync()
+        self.book_selector.sync()
+
+def book_label(book):
+    label = f"{book.name} by {book.author}"
+    return f"{label} [{book.isbn}]" if book.isbn else label
+
+class Selector:
+    # A typeahead Combobox: typing narrows the list to the first matches and
+    # a choice is resolved by the item's id rather than by its label.  The id
+    # of the row picked from the list is kept, since current() maps the text
+    # back to the first row with that label and two items may share one.
+    def __init__(self, parent, items, label, limit=50):
+        self.typeahead = Typeahead(items, label)
+        self.limit = limit
+        self.matches = []
+        self.chosen = None
+        self.combobox = ttk.Combobox(parent, width=30, postcommand=self.filter)
+        self.combobox.bind("<KeyRelease>", self.on_key)
+        self.combobox.bind("<<ComboboxSelected>>", self.on_select)
+
+    def sync(self):
+        self.typeahead.sync()
+
+    def on_key(self, event):
+        if event.keysym not in ("Up", "Down", "Return", "Escape", "Tab"):
+            self.chosen = None
+            self.filter()
+
+    def on_select(self, event):
+        i = self.combobox.current()
+        self.chosen = self.matches[i] if 0 <= i < len(self.matches) else None
+
+    def filter(self):
+        self.matches = self.typeahead.search(self.combobox.get(), self.limit)
+        items = self.typeahead.items
+        self.combobox["values"] = [self.typeahead.label(items[i]) for i in self.matches]
+
+    def selected(self):
+        items = self.typeahead.items
+        if self.chosen is not None and self.typeahead.label(items[self.chosen]) == self.combobox.get():
+            return items[self.chosen]
+        i = self.combobox.current()
+        if i < 0:
+            self.filter()
+            i = self.combobox.current()
+        return self.typeahead.items[self.matches[i]] if i >= 0 else None
+
+class InvoiceBrowser:
+    # Only the visible rows live in the Treeview; scrolling asks the
+    # BookStore view for the next page instead of loading every invoice.
+    COLUMNS = (
+        ("invoice_nbr", "Invoice"),
+        ("customer", "Customer"),
+        ("book", "Book"),
+        ("ship_date", "Ship Date"),
+        ("urgent", "Urgent"),
+        ("total", "Total"),
+    )
+
+    def __init__(self, root, bookstore, tasks=None, rows=25):
+        self.bookstore = bookstore
+        self.tasks = tasks
+        self.rows = rows
+        self.offset = 0
+        self.sort_by = "invoice_nbr"
+        self.descending = False
+        self.email = None
+        self.view = None
+
+        self.window = tk.Toplevel(root)
+        self.window.title("All Invoices")
+
+        frame = tk.Frame(self.window)
+        frame.pack(fill="x", pady=5)
+        tk.Label(frame, text="Customer Email:").pack(side="left")
+        self.email_filter = tk.Entry(frame)
+        self.email_filter.pack(side="left")
+        self.email_filter.bind("<Return>", lambda event: self.apply_filter())
+        tk.Button(frame, text="Filter", command=self.apply_filter).pack(side="left")
+
+        frame = tk.Frame(self.window)
+        frame.pack(fill="both", expand=True)
+        self.tree = ttk.Treeview(frame, columns=[column for column, _ in self.COLUMNS],
+                                 show="headings", height=rows)
+        for column, heading in self.COLUMNS:
+            self.tree.heading(column, text=heading, command=lambda column=column: self.sort(column))
+            self.tree.column(column, width=110)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll("scroll", -event.delta // 120, "units"))
+        self.tree.bind("<Button-4>", lambda event: self.scroll("scroll", -1, "units"))
+        self.tree.bind("<Button-5>", lambda event: self.scroll("scroll", 1, "units"))
+
+        self.status = tk.Label(self.window, anchor="w")
+        self.status.pack(fill="x")
+        self.refresh()
+
+    def refresh(self):
+        # Sorting and filtering happen on the worker, after any pending writes
+        if self.tasks is None:
+            self.show(self.bookstore.view(self.sort_by, self.descending, self.email))
+        else:
+            self.tasks.submit_latest(self, self.bookstore.view, self.sort_by, self.descending, self.email,
+                                     on_done=self.show)
+
+    def show(self, view):
+        self.view = view
+        self.redraw()
+
+    def redraw(self):
+        total = len(self.view)
+        self.offset = max(min(self.offset, total - self.rows), 0)
+        self.tree.delete(*self.tree.get_children())
+        for invoice in self.view.page(self.offset, self.rows):
+            shipping = invoice.ship_order
+            self.tree.insert("", "end", values=(
+                invoice.invoice_nbr, shipping.order.customer.name, invoice.stock.name,
+                shipping.ship_date.isoformat(), "Yes" if shipping.is_urgent else "No",
+                f"{invoice.invoice():.2f}",
+            ))
+        if total:
+            self.scrollbar.set(self.offset / total, min((self.offset + self.rows) / total, 1.0))
+            self.status.config(text=f"Rows {self.offset + 1:,}-{min(self.offset + self.rows, total):,} of {total:,}")
+        else:
+            self.scrollbar.set(0.0, 1.0)
+            self.status.config(text="No matching invoices")
+
+    def scroll(self, action, amount, unit=None):
+        if self.view is None:
+            return
+        if action == "moveto":
+            self.offset = int(float(amount) * len(self.view))
+        else:
+            step = self.rows if unit == "pages" else 1
+            self.offset += int(amount) * step
+        self.redraw()
+
+    def sort(self, column):
+        if column == self.sort_by:
+            self.descending = not self.descending
+        else:
+            self.sort_by = column
+            self.descending = False
+        self.offset = 0
+        self.refresh()
+
+    def apply_filter(self):
+        self.email = self.email_filter.get().strip() or None
+        self.offset = 0
+        self.refresh()
 
 if __name__ == "__main__":
     root = tk.Tk()
-    app = BookstoreApp(root)
+    app = BookstoreApp(root, StorageEngine("bookstore_data").load())
     root.mainloop()
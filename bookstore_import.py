@@ -0,0 +1,156 @@
+import csv
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from bookstore_core import Customer, Stock
+
+STOCK_FIELDS = ("name", "author", "price")
+CUSTOMER_FIELDS = ("name", "phone", "email")
+
+
+def iter_records(path: str):
+    """
+    Streams dict records from a CSV file with a header row or a JSONL file.
+
+    The format is chosen by the ``.jsonl`` / ``.ndjson`` extension; anything
+    else is read as CSV.  Blank JSONL lines are skipped and a malformed one
+    raises ValueError; ``import_records`` rejects it instead.
+    """
+    for record in _iter_rows(path):
+        yield json.loads(record) if type(record) is str else record
+
+
+def build_stock(record: dict) -> Stock:
+    """
+    Builds a Stock from a record, raising ValueError like the setters do.
+
+    An ``isbn`` field is optional.
+
+    Examples:
+        >>> build_stock({"name": "1984", "author": "George Orwell", "price": "8.99"}).price
+        8.99
+        >>> build_stock({"name": "1984", "author": "", "price": "8.99"})
+        Traceback (most recent call last):
+        ...
+        ValueError: Author name cannot be empty.
+    """
+    name, author, price = _fields(record, STOCK_FIELDS)
+    try:
+        price = float(price)
+    except (TypeError, ValueError):
+        raise ValueError("Price must be a valid number") from None
+    return Stock(name, author, price, record.get("isbn") or None)
+
+
+def build_customer(record: dict) -> Customer:
+    """
+    Builds a Customer from a record, raising ValueError like the setters do.
+    """
+    return Customer(*_fields(record, CUSTOMER_FIELDS))
+
+
+def import_stocks(path: str, rejects_path: str, workers: int = None, chunk_size: int = 10_000):
+    """
+    Streams Stock objects from a CSV/JSONL publisher feed.
+
+    See ``import_records``.
+    """
+    return import_records(path, build_stock, rejects_path, workers, chunk_size)
+
+
+def import_customers(path: str, rejects_path: str, workers: int = None, chunk_size: int = 10_000):
+    """
+    Streams Customer objects from a CSV/JSONL file.
+
+    See ``import_records``.
+    """
+    return import_records(path, build_customer, rejects_path, workers, chunk_size)
+
+
+def import_records(path: str, build, rejects_path: str, workers: int = None, chunk_size: int = 10_000):
+    """
+    Streams objects built from every record of a CSV/JSONL file.
+
+    Records are read ``chunk_size`` at a time and built by ``build`` (a
+    module-level function, so it can run in another process).  With
+    ``workers`` greater than one the chunks run on a process pool with at
+    most ``2 * workers`` chunks in flight, so memory stays constant however
+    large the file is.  Records that ``build`` rejects with ValueError are
+    written to ``rejects_path`` as JSONL with their row number and reason
+    instead of stopping the import; so are JSONL lines that are not valid
+    JSON, which are parsed alongside the build and rejected with the line's
+    text as the record.  Rows are numbered from 1, not counting a CSV header
+    or blank JSONL lines.
+
+    Examples:
+        >>> import os, tempfile
+        >>> directory = tempfile.mkdtemp()
+        >>> feed = os.path.join(directory, "books.csv")
+        >>> with open(feed, "w") as f:
+        ...     _ = f.write("name,author,price\\n1984,George Orwell,8.99\\nBad,,1\\n")
+        >>> rejects = os.path.join(directory, "rejects.jsonl")
+        >>> [stock.name for stock in import_stocks(feed, rejects)]
+        ['1984']
+        >>> print(open(rejects).read().strip())
+        {"row": 2, "reason": "Author name cannot be empty.", "record": {"name": "Bad", "author": "", "price": "1"}}
+    """
+    records = _iter_rows(path)
+    chunks = iter(lambda: list(islice(records, chunk_size)), [])
+    with open(rejects_path, "w", encoding="utf-8") as rejects:
+        if workers is not None and workers > 1:
+            results = _pooled(chunks, build, workers)
+        else:
+            results = (_build_chunk(build, chunk) for chunk in chunks)
+        first_row = 1
+        for count, built, rejected in results:
+            for offset, reason, record in rejected:
+                rejects.write(json.dumps({"row": first_row + offset, "reason": reason, "record": record}) + "\n")
+            first_row += count
+            yield from built
+
+
+def _iter_rows(path: str):
+    # CSV rows come back as dicts; JSONL lines stay unparsed strings.
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                if line.strip():
+                    yield line.rstrip("\r\n")
+        else:
+            yield from csv.DictReader(f)
+
+
+def _pooled(chunks, build, workers: int):
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for chunk in chunks:
+            pending.append(pool.submit(_build_chunk, build, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def _build_chunk(build, chunk: list) -> tuple:
+    built, rejected = [], []
+    for offset, record in enumerate(chunk):
+        try:
+            if type(record) is str:
+                record = json.loads(record)
+            built.append(build(record))
+        except (ValueError, TypeError, AttributeError) as e:
+            rejected.append((offset, str(e), record))
+    return len(chunk), built, rejected
+
+
+def _fields(record: dict, names: tuple) -> list:
+    missing = [name for name in names if record.get(name) is None]
+    if missing:
+        raise ValueError(f"Missing field: {', '.join(missing)}")
+    return [record[name] for name in names]
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
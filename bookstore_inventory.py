@@ -0,0 +1,202 @@
+import threading
+
+from bookstore_core import Stock
+
+
+class StockLevel:
+    """
+    Represents the quantities held for one book.
+
+    ``on_hand`` counts copies in the warehouse, ``reserved`` those held for
+    orders being placed and ``committed`` those sold.  Copies available to
+    new orders are ``on_hand - reserved``.
+    """
+    __slots__ = ("on_hand", "reserved", "committed", "threshold", "lock")
+
+    def __init__(self, threshold: int):
+        self.on_hand = 0
+        self.reserved = 0
+        self.committed = 0
+        self.threshold = threshold
+        self.lock = threading.Lock()
+
+    @property
+    def available(self) -> int:
+        return self.on_hand - self.reserved
+
+
+class Reservation:
+    """
+    Represents copies of a book held for an order until commit or release.
+    """
+    __slots__ = ("stock", "quantity", "open")
+
+    def __init__(self, stock: Stock, quantity: int):
+        self.stock = stock
+        self.quantity = quantity
+        self.open = True
+
+
+class Inventory:
+    """
+    Tracks stock quantities with reservations and low-stock alerts.
+
+    Each book has its own lock, so orders for different titles never
+    contend and orders for one hot title serialize only on that title.
+    Every change re-checks the book against its threshold and moves it in or
+    out of the low-stock bucket, so ``low_stock`` never scans the catalog;
+    ``on_low_stock`` is called once each time a book drops below its
+    threshold.
+
+    Examples:
+        >>> stock = Stock("1984", "George Orwell", 8.99)
+        >>> inventory = Inventory(threshold=2)
+        >>> inventory.receive(stock, 3)
+        >>> reservation = inventory.reserve(stock, 2)
+        >>> inventory.available(stock), [s.name for s in inventory.low_stock()]
+        (1, ['1984'])
+        >>> inventory.commit(reservation)
+        >>> level = inventory.level(stock)
+        >>> level.on_hand, level.reserved, level.committed
+        (1, 0, 2)
+        >>> inventory.reserve(stock, 2)
+        Traceback (most recent call last):
+        ...
+        ValueError: Insufficient stock for 1984: 1 available, 2 requested.
+    """
+    def __init__(self, threshold: int = 5, on_low_stock=None):
+        self.threshold = threshold
+        self.on_low_stock = on_low_stock
+        self._levels = {}
+        self._low = {}
+        self._lock = threading.Lock()
+
+    def level(self, stock: Stock) -> StockLevel:
+        """
+        Retrieves the quantities of a book, creating an empty record if new.
+        """
+        level = self._levels.get(stock)
+        if level is None:
+            with self._lock:
+                level = self._levels.get(stock)
+                if level is None:
+                    level = self._levels[stock] = StockLevel(self.threshold)
+        return level
+
+    def available(self, stock: Stock) -> int:
+        """
+        Counts the copies of a book that new orders can reserve.
+        """
+        return self.level(stock).available
+
+    def receive(self, stock: Stock, quantity: int):
+        """
+        Adds delivered copies to the quantity on hand.
+        """
+        if quantity <= 0:
+            raise ValueError("Quantity must be greater than zero.")
+        level = self.level(stock)
+        with level.lock:
+            level.on_hand += quantity
+            self._check(stock, level)
+
+    def set_threshold(self, stock: Stock, threshold: int):
+        """
+        Sets the available quantity below which a book counts as low.
+        """
+        level = self.level(stock)
+        with level.lock:
+            level.threshold = threshold
+            self._check(stock, level)
+
+    def reserve(self, stock: Stock, quantity: int = 1) -> Reservation:
+        """
+        Holds copies of a book, raising ValueError if too few are available.
+        """
+        if quantity <= 0:
+            raise ValueError("Quantity must be greater than zero.")
+        level = self.level(stock)
+        with level.lock:
+            if level.available < quantity:
+                raise ValueError(f"Insufficient stock for {stock.name}: "
+                                 f"{level.available} available, {quantity} requested.")
+            level.reserved += quantity
+            self._check(stock, level)
+        return Reservation(stock, quantity)
+
+    def reserve_all(self, items) -> list:
+        """
+        Reserves every ``(stock, quantity)`` item, or none of them.
+        """
+        reservations = []
+        try:
+            for stock, quantity in items:
+                reservations.append(self.reserve(stock, quantity))
+        except ValueError:
+            self.release_all(reservations)
+            raise
+        return reservations
+
+    def commit(self, reservation: Reservation):
+        """
+        Turns a reservation into a sale, removing the copies from stock.
+        """
+        level = self.level(reservation.stock)
+        with level.lock:
+            self._close(reservation)
+            level.reserved -= reservation.quantity
+            level.on_hand -= reservation.quantity
+            level.committed += reservation.quantity
+
+    def release(self, reservation: Reservation):
+        """
+        Returns reserved copies to the available quantity.
+        """
+        level = self.level(reservation.stock)
+        with level.lock:
+            self._close(reservation)
+            level.reserved -= reservation.quantity
+            self._check(reservation.stock, level)
+
+    def commit_all(self, reservations):
+        """
+        Commits every reservation.
+        """
+        for reservation in reservations:
+            self.commit(reservation)
+
+    def release_all(self, reservations):
+        """
+        Releases every reservation.
+        """
+        for reservation in reservations:
+            self.release(reservation)
+
+    def low_stock(self) -> list:
+        """
+        Retrieves the books whose available quantity is below their threshold.
+        """
+        with self._lock:
+            return list(self._low)
+
+    def _close(self, reservation: Reservation):
+        if not reservation.open:
+            raise ValueError("Reservation is already committed or released.")
+        reservation.open = False
+
+    def _check(self, stock: Stock, level: StockLevel):
+        # Called with level.lock held.
+        is_low = level.available < level.threshold
+        with self._lock:
+            was_low = stock in self._low
+            if is_low and not was_low:
+                self._low[stock] = None
+            elif was_low and not is_low:
+                del self._low[stock]
+        if is_low and not was_low and self.on_low_stock is not None:
+            self.on_low_stock(stock, level.available)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,283 @@
+import cProfile
+import functools
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bookstore_core import BookStore, Invoice, LatencyHistogram, Person, Product, Shipping, Stock
+from bookstore_rates import RateEngine
+
+# Methods timed when instrumentation is on; sized ones also record how many
+# rows they return.  Batches placed with ``place_orders`` are stored through
+# ``store_invoices`` and priced through ``RateEngine.quote_many`` rather than
+# ``add_invoice`` and ``calc_ship_cost``, so those are timed too.
+METHODS = (
+    (BookStore, "add_invoice", False),
+    (BookStore, "place_orders", True),
+    (BookStore, "store_invoices", False),
+    (BookStore, "search_invoice", False),
+    (BookStore, "invoices_for_customer", True),
+    (BookStore, "invoices_for_stock", True),
+    (Shipping, "calc_ship_cost", False),
+    (RateEngine, "quote_many", True),
+    (Invoice, "invoice", False),
+)
+
+# Validating property setters timed when instrumentation is on.
+SETTERS = (
+    (Person, "name"),
+    (Person, "phone"),
+    (Person, "email"),
+    (Product, "name"),
+    (Product, "price_cents"),
+    (Stock, "author"),
+)
+
+ROW_BOUNDS = (0, 1, 10, 100, 1000, 10_000, 100_000)
+
+_originals = {}
+_lock = threading.Lock()
+
+
+class Metrics:
+    """
+    Collects call latencies, error counts and result sizes per operation.
+
+    Updates are not locked, so counts taken while several threads call the
+    same operation are approximate.
+    """
+    def __init__(self):
+        self.latencies = {}
+        self.rows = {}
+        self.errors = {}
+
+    def latency(self, name: str) -> LatencyHistogram:
+        """
+        Retrieves the latency histogram of an operation, creating it if new.
+        """
+        histogram = self.latencies.get(name)
+        if histogram is None:
+            histogram = self.latencies[name] = LatencyHistogram()
+        return histogram
+
+    def row_counts(self, name: str) -> LatencyHistogram:
+        """
+        Retrieves the histogram of rows returned by an operation.
+        """
+        histogram = self.rows.get(name)
+        if histogram is None:
+            histogram = self.rows[name] = LatencyHistogram(ROW_BOUNDS)
+        return histogram
+
+    def snapshot(self) -> dict:
+        """
+        Summarizes every operation for reporting.
+        """
+        return {name: dict(histogram.snapshot(), errors=self.errors.get(name, 0))
+                for name, histogram in sorted(self.latencies.items())}
+
+    def to_prometheus(self) -> str:
+        """
+        Renders the metrics in the Prometheus text exposition format.
+
+        Examples:
+            >>> metrics = Metrics()
+            >>> metrics.latency("Invoice.invoice").record(0.0002)
+            >>> print(metrics.to_prometheus().splitlines()[2])
+            bookstore_calls_total{op="Invoice.invoice"} 1
+        """
+        lines = [
+            "# HELP bookstore_calls_total Calls to instrumented bookstore operations.",
+            "# TYPE bookstore_calls_total counter",
+        ]
+        for name, histogram in sorted(self.latencies.items()):
+            lines.append(f'bookstore_calls_total{{op="{name}"}} {histogram.count}')
+        lines += [
+            "# HELP bookstore_errors_total Calls that raised an exception.",
+            "# TYPE bookstore_errors_total counter",
+        ]
+        for name in sorted(self.latencies):
+            lines.append(f'bookstore_errors_total{{op="{name}"}} {self.errors.get(name, 0)}')
+        lines += _histogram_lines("bookstore_latency_seconds", "Latency of bookstore operations.",
+                                  self.latencies)
+        lines += _histogram_lines("bookstore_result_rows", "Rows returned by bookstore queries.",
+                                  self.rows)
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """
+        Writes the metrics to a file atomically, for a node exporter textfile collector.
+        """
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(path + ".tmp", path)
+
+    def serve_prometheus(self, port: int = 9108, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Serves the metrics over HTTP from a daemon thread.
+
+        Call ``shutdown()`` on the returned server to stop it.
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def enable(metrics: Metrics = None) -> Metrics:
+    """
+    Starts timing the hot paths and returns the metrics they record into.
+
+    The methods in ``METHODS`` and the setters in ``SETTERS`` are replaced
+    with timing wrappers; ``disable`` puts the originals back, so code runs
+    unchanged while instrumentation is off.
+
+    Examples:
+        >>> metrics = enable()
+        >>> Stock("1984", "George Orwell", 8.99).price_cents
+        899
+        >>> metrics.snapshot()["Product.price_cents"]["count"]
+        1
+        >>> disable()
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    with _lock:
+        _restore()
+        for cls, name, sized in METHODS:
+            original = cls.__dict__[name]
+            _originals[(cls, name)] = original
+            setattr(cls, name, _timed(metrics, f"{cls.__name__}.{name}", original, sized))
+        for cls, name in SETTERS:
+            original = cls.__dict__[name]
+            _originals[(cls, name)] = original
+            setter = _timed(metrics, f"{cls.__name__}.{name}", original.fset)
+            setattr(cls, name, property(original.fget, setter, original.fdel, original.__doc__))
+    return metrics
+
+
+def disable():
+    """
+    Restores the uninstrumented methods and setters.
+    """
+    with _lock:
+        _restore()
+
+
+@contextmanager
+def instrumented(metrics: Metrics = None):
+    """
+    Enables instrumentation for the duration of a with block.
+    """
+    metrics = enable(metrics)
+    try:
+        yield metrics
+    finally:
+        disable()
+
+
+class Capture:
+    """
+    Represents the results of a ``profile`` block, filled in when it exits.
+    """
+    __slots__ = ("stats", "snapshot")
+
+    def __init__(self):
+        self.stats = None
+        self.snapshot = None
+
+
+@contextmanager
+def profile(path: str = None, memory: bool = False):
+    """
+    Profiles a with block with cProfile and, optionally, tracemalloc.
+
+    The yielded ``Capture`` holds the ``pstats.Stats`` and, with ``memory``,
+    a ``tracemalloc.Snapshot`` once the block exits.  With ``path`` the
+    profile is also dumped there for ``snakeviz`` or ``pstats``.
+
+    Examples:
+        >>> with profile(memory=True) as capture:
+        ...     _ = [Stock("1984", "George Orwell", 8.99) for _ in range(100)]
+        >>> capture.stats.total_calls > 100, capture.snapshot is not None
+        (True, True)
+    """
+    capture = Capture()
+    profiler = cProfile.Profile()
+    tracing = memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    profiler.enable()
+    try:
+        yield capture
+    finally:
+        profiler.disable()
+        if memory:
+            capture.snapshot = tracemalloc.take_snapshot()
+        if tracing:
+            tracemalloc.stop()
+        capture.stats = pstats.Stats(profiler)
+        if path is not None:
+            profiler.dump_stats(path)
+
+
+def _timed(metrics: Metrics, name: str, fn, sized: bool = False):
+    histogram = metrics.latency(name)
+    rows = metrics.row_counts(name) if sized else None
+    errors = metrics.errors
+    clock = time.perf_counter
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            errors[name] = errors.get(name, 0) + 1
+            raise
+        finally:
+            histogram.record(clock() - start)
+        if rows is not None:
+            rows.record(len(result))
+        return result
+    return wrapper
+
+
+def _restore():
+    for (cls, name), original in _originals.items():
+        setattr(cls, name, original)
+    _originals.clear()
+
+
+def _histogram_lines(metric: str, help_text: str, histograms: dict) -> list:
+    lines = [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+    for name, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.bounds, histogram.counts):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{op="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{op="{name}",le="+Inf"}} {histogram.count}')
+        lines.append(f'{metric}_sum{{op="{name}"}} {histogram.total}')
+        lines.append(f'{metric}_count{{op="{name}"}} {histogram.count}')
+    return lines
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,214 @@
+import mmap
+import pickle
+import struct
+from collections import namedtuple
+from datetime import date
+from bookstore_core import Customer, Stock, Order, Shipping, Invoice
+
+MAGIC = b"BKINV003"
+HEADER = struct.Struct("<8sQQ")
+ROW = struct.Struct("<16sIIqqiB3x")
+
+# The stock id of an invoice whose order has no lines left.
+NO_STOCK = 0xFFFFFFFF
+
+# The same row layout as a NumPy structured dtype, for np.frombuffer.
+NUMPY_DTYPE = [
+    ("invoice_nbr", "S16"),
+    ("stock_id", "<u4"),
+    ("customer_id", "<u4"),
+    ("price_cents", "<i8"),
+    ("ship_cost_cents", "<i8"),
+    ("ship_day", "<i4"),
+    ("is_urgent", "u1"),
+    ("_pad", "V3"),
+]
+
+InvoiceRecord = namedtuple(
+    "InvoiceRecord", "invoice_nbr stock_id customer_id price_cents ship_cost_cents ship_date is_urgent")
+
+
+def export_invoices(path: str, invoices):
+    """
+    Writes invoices to a fixed-width binary file sorted by invoice number.
+
+    The file is a header, one 48-byte row per invoice, then the customer and
+    book tables the rows refer to by id.  Money is stored as int64 cents.
+    Like ``InvoiceLedger``, a row's price column holds the order subtotal
+    and its book id the first book; the ``(book id, quantity)`` lines of
+    every other order are kept with the tables.  Invoice numbers are
+    limited to 16 bytes of UTF-8.
+
+    Examples:
+        >>> import os, tempfile
+        >>> from datetime import date
+        >>> from bookstore_core import BookStore
+        >>> customer = Customer("Alice", "1234567890", "alice@example.com")
+        >>> books = [(Stock("1984", "George Orwell", 8.99), 2), (Stock("Emma", "Jane Austen", 6.5), 1)]
+        >>> invoices = BookStore().place_orders([(customer, books, False, date(2025, 1, 1))])
+        >>> path = os.path.join(tempfile.mkdtemp(), "invoices.bin")
+        >>> export_invoices(path, invoices)
+        >>> with InvoiceFile(path) as invoice_file:
+        ...     loaded, = invoice_file.load_invoices()
+        ...     print(invoice_file.total(), loaded.total_cents, [line.quantity for line in loaded.ship_order.order.lines])
+        28.43 2843 [2, 1]
+    """
+    customers, customer_ids = [], {}
+    stocks, stock_ids = [], {}
+    rows = []
+    multi_lines = {}
+    for invoice in invoices:
+        shipping = invoice.ship_order
+        key = invoice.invoice_nbr.encode()
+        if len(key) > 16:
+            raise ValueError(f"Invoice number too long for export: {invoice.invoice_nbr}")
+        customer = shipping.order.customer
+        if customer not in customer_ids:
+            customer_ids[customer] = len(customers)
+            customers.append((customer.name, customer.phone, customer.email))
+        lines = shipping.order.lines
+        for line in lines:
+            if line.stock not in stock_ids:
+                stock_ids[line.stock] = len(stocks)
+                stocks.append((line.stock.name, line.stock.author, line.stock.price, line.stock.isbn))
+        if len(lines) != 1 or lines[0].quantity != 1:
+            multi_lines[invoice.invoice_nbr] = tuple((stock_ids[line.stock], line.quantity) for line in lines)
+        rows.append((key, stock_ids[lines[0].stock] if lines else NO_STOCK, customer_ids[customer],
+                     shipping.order.subtotal_cents, shipping.ship_cost_cents, shipping.ship_date.toordinal(),
+                     int(shipping.is_urgent)))
+    rows.sort(key=lambda row: row[0])
+    tables_offset = HEADER.size + ROW.size * len(rows)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(rows), tables_offset))
+        for row in rows:
+            f.write(ROW.pack(*row))
+        pickle.dump((customers, stocks, multi_lines), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class InvoiceFile:
+    """
+    Represents a read-only, memory-mapped view of an exported invoice file.
+
+    Rows are read straight out of the mapping through ``memoryview`` and
+    ``struct``, so lookups and totals never deserialize Python objects.
+    ``search_invoice`` binary-searches the sorted rows.  ``price_cents`` is
+    the order subtotal, and ``stock_id`` is the first book or ``NO_STOCK``.
+
+    Examples:
+        >>> import os, tempfile
+        >>> from datetime import date
+        >>> from bookstore_core import BookStore
+        >>> customer = Customer("Alice", "1234567890", "alice@example.com")
+        >>> stock = Stock("1984", "George Orwell", 8.99)
+        >>> invoices = BookStore().place_orders([(customer, stock, i % 2 == 0, date(2025, 1, 1)) for i in range(3)])
+        >>> path = os.path.join(tempfile.mkdtemp(), "invoices.bin")
+        >>> export_invoices(path, invoices)
+        >>> with InvoiceFile(path) as invoice_file:
+        ...     print(len(invoice_file), invoice_file.total(), invoice_file.search_invoice("INV0002").ship_cost_cents)
+        3 41.82 395
+    """
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, self._tables_offset = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Not an invoice file: {path}")
+        self._rows = memoryview(self._mm)[HEADER.size:self._tables_offset]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self):
+        for fields in ROW.iter_unpack(self._rows):
+            yield _record(fields)
+
+    def row(self, i: int) -> InvoiceRecord:
+        """
+        Reads the i-th row in invoice number order.
+        """
+        return _record(ROW.unpack_from(self._rows, i * ROW.size))
+
+    def search_invoice(self, invoice_nbr: str):
+        """
+        Binary-searches the rows for an invoice number.
+        """
+        key = invoice_nbr.encode().ljust(16, b"\0")
+        mm = self._mm
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = HEADER.size + mid * ROW.size
+            if mm[offset:offset + 16] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        offset = HEADER.size + lo * ROW.size
+        if lo < self._count and mm[offset:offset + 16] == key:
+            return self.row(lo)
+        return None
+
+    def total(self) -> float:
+        """
+        Calculates the total of every invoice in one pass over the mapping.
+        """
+        return sum(fields[3] + fields[4] for fields in ROW.iter_unpack(self._rows)) / 100
+
+    def to_numpy(self):
+        """
+        Returns the rows as a zero-copy NumPy structured array.
+
+        Requires NumPy, which the rest of the project does not depend on.
+        """
+        import numpy
+        return numpy.frombuffer(self._mm, dtype=NUMPY_DTYPE, count=self._count, offset=HEADER.size)
+
+    def load_invoices(self) -> list:
+        """
+        Rebuilds Invoice objects, sharing one Customer and Stock per id.
+        """
+        customer_rows, stock_rows, multi_lines = pickle.loads(self._mm[self._tables_offset:])
+        customers = [Customer.from_trusted(*fields) for fields in customer_rows]
+        stocks = [Stock.from_trusted(*fields) for fields in stock_rows]
+        invoices = []
+        for record in self:
+            customer = customers[record.customer_id]
+            lines = multi_lines.get(record.invoice_nbr)
+            if lines is None:
+                stock = stocks[record.stock_id]
+                order = Order(customer, stock)
+            else:
+                order = Order.from_lines(customer, [(stocks[key], quantity) for key, quantity in lines])
+                stock = order.stock
+            shipping = Shipping(order, record.ship_date)
+            shipping.ship_cost_cents = record.ship_cost_cents
+            shipping.is_urgent = record.is_urgent
+            invoices.append(Invoice(record.invoice_nbr, stock, shipping))
+        return invoices
+
+    def close(self):
+        """
+        Releases the mapping and the underlying file.
+        """
+        if getattr(self, "_rows", None) is not None:
+            self._rows.release()
+            self._rows = None
+        self._mm.close()
+        self._file.close()
+
+
+def _record(fields: tuple) -> InvoiceRecord:
+    key, stock_id, customer_id, price_cents, ship_cost_cents, ship_day, is_urgent = fields
+    return InvoiceRecord(key.rstrip(b"\0").decode(), stock_id, customer_id, price_cents, ship_cost_cents,
+                         date.fromordinal(ship_day), bool(is_urgent))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
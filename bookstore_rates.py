@@ -0,0 +1,179 @@
+import csv
+import json
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+SHIP_COST_STANDARD = 3.95
+SHIP_COST_URGENT = 5.45
+DEFAULT_ZONE = "domestic"
+
+
+class RateTable:
+    """
+    Represents shipping rates by zone, weight band, urgency and carrier.
+
+    Each row is ``(zone, carrier, max_weight, is_urgent, cost)``: the cost of
+    shipping a parcel of up to ``max_weight`` in that zone.  The rows are
+    precomputed into a dict keyed by ``(zone, band, is_urgent)``, where a
+    zone's bands are its distinct ``max_weight`` values in ascending order,
+    so a lookup is one bisect and one dict access.
+
+    Examples:
+        >>> table = RateTable([
+        ...     ("domestic", "post", 1.0, False, 3.95),
+        ...     ("domestic", "post", 5.0, False, 6.50),
+        ...     ("domestic", "courier", 5.0, False, 5.90),
+        ... ])
+        >>> table.lookup("domestic", 0.4, False), table.lookup("domestic", 2.0, False)
+        (3.95, 5.9)
+        >>> table.lookup("domestic", 2.0, False, carrier="post")
+        6.5
+        >>> table.lookup("domestic", 9.0, False)
+        Traceback (most recent call last):
+        ...
+        ValueError: No shipping rate for zone 'domestic', weight 9.0.
+    """
+    def __init__(self, rows):
+        self.rows = [(zone, carrier, float(max_weight), bool(is_urgent), float(cost))
+                     for zone, carrier, max_weight, is_urgent, cost in rows]
+        self._bands = {}
+        for zone, _, max_weight, _, _ in self.rows:
+            self._bands.setdefault(zone, set()).add(max_weight)
+        self._bands = {zone: sorted(weights) for zone, weights in self._bands.items()}
+        self._index = {}
+        # Rows go lightest first, so a carrier's rate for a heavier band only
+        # fills the lighter bands that carrier does not price itself.
+        for zone, carrier, max_weight, is_urgent, cost in sorted(self.rows, key=lambda row: row[2]):
+            bands = self._bands[zone]
+            for band in range(bands.index(max_weight) + 1):
+                self._index.setdefault((zone, band, is_urgent), {}).setdefault(carrier, cost)
+        self._cheapest = {key: min(carriers.values()) for key, carriers in self._index.items()}
+
+    @classmethod
+    def from_file(cls, path: str):
+        """
+        Loads rates from a CSV file with a header row or a JSON list.
+
+        Both formats use the fields ``zone``, ``carrier``, ``max_weight``,
+        ``urgent`` and ``cost``; ``urgent`` is true for ``1``/``true``/``yes``.
+        """
+        with open(path, newline="", encoding="utf-8") as f:
+            records = json.load(f) if path.endswith(".json") else list(csv.DictReader(f))
+        return cls((r["zone"], r["carrier"], r["max_weight"], _truthy(r["urgent"]), r["cost"])
+                   for r in records)
+
+    def lookup(self, zone: str, weight: float, is_urgent: bool, carrier: str = None) -> float:
+        """
+        Finds the rate for a parcel, cheapest across carriers unless one is given.
+
+        Examples:
+            >>> DEFAULT_RATES.lookup(DEFAULT_ZONE, 2.0, False)
+            3.95
+            >>> DEFAULT_RATES.lookup("intl", 2.0, False)
+            Traceback (most recent call last):
+            ...
+            ValueError: No shipping rate for zone 'intl', weight 2.0.
+        """
+        bands = self._bands.get(zone)
+        if bands is None:
+            raise ValueError(f"No shipping rate for zone {zone!r}, weight {weight}.")
+        key = (zone, bisect_left(bands, weight), bool(is_urgent))
+        if carrier is None:
+            cost = self._cheapest.get(key)
+        else:
+            cost = self._index.get(key, {}).get(carrier)
+        if cost is None:
+            raise ValueError(f"No shipping rate for zone {zone!r}, weight {weight}.")
+        return cost
+
+
+DEFAULT_RATES = RateTable([
+    (DEFAULT_ZONE, "standard", float("inf"), False, SHIP_COST_STANDARD),
+    (DEFAULT_ZONE, "standard", float("inf"), True, SHIP_COST_URGENT),
+])
+
+
+class RateEngine:
+    """
+    Quotes shipping costs from a RateTable through an LRU cache with TTL.
+
+    Up to ``cache_size`` quotes are memoized for ``ttl`` seconds; the least
+    recently used quote is evicted first.  ``quote_many`` prices a batch by
+    quoting each distinct request once.  The engine is safe to share
+    between threads.
+
+    Examples:
+        >>> engine = RateEngine(DEFAULT_RATES)
+        >>> engine.quote(DEFAULT_ZONE, 0.5, True)
+        5.45
+        >>> engine.quote_many([(DEFAULT_ZONE, 0.5, False), (DEFAULT_ZONE, 0.5, True), (DEFAULT_ZONE, 0.5, False)])
+        [3.95, 5.45, 3.95]
+        >>> engine.cache_info()
+        {'hits': 1, 'misses': 2, 'size': 2}
+    """
+    def __init__(self, table: RateTable, cache_size: int = 4096, ttl: float = 300.0, clock=time.monotonic):
+        self.table = table
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self._clock = clock
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def quote(self, zone: str, weight: float, is_urgent: bool, carrier: str = None) -> float:
+        """
+        Quotes the cost of shipping one parcel.
+        """
+        key = (zone, weight, bool(is_urgent), carrier)
+        now = self._clock()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > now:
+                self._cache.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
+        cost = self.table.lookup(zone, weight, is_urgent, carrier)
+        with self._lock:
+            self._cache[key] = (now + self.ttl, cost)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return cost
+
+    def quote_many(self, requests) -> list:
+        """
+        Quotes ``(zone, weight, is_urgent[, carrier])`` requests in one pass.
+        """
+        requests = [tuple(request) for request in requests]
+        costs = {request: self.quote(*request) for request in dict.fromkeys(requests)}
+        return [costs[request] for request in requests]
+
+    def load(self, table: RateTable):
+        """
+        Switches to a new rate table and drops every cached quote.
+        """
+        with self._lock:
+            self.table = table
+            self._cache.clear()
+
+    def cache_info(self) -> dict:
+        """
+        Reports cache hits, misses and current size.
+        """
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses, "size": len(self._cache)}
+
+
+def _truthy(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
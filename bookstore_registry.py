@@ -0,0 +1,118 @@
+from bookstore_core import Customer, Stock, normalize_isbn
+
+
+class Registry:
+    """
+    Represents an identity map that gives each item a stable integer id.
+
+    Ids are assigned in insertion order and never reused, so the registry
+    reads like an append-only list: ``registry[item_id]`` is an O(1) lookup
+    and ``len`` is the next id.  Each item may also have a natural key
+    (``key(item)``, None for none); keys are unique, so adding a second item
+    with the same key raises ValueError.  Adding an item that is already
+    registered returns its existing id.
+    """
+    def __init__(self, key, label: str):
+        self._key = key
+        self._label = label
+        self._items = []
+        self._ids = {}
+        self._keys = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __getitem__(self, item_id: int):
+        return self._items[item_id]
+
+    def __contains__(self, item) -> bool:
+        return item in self._ids
+
+    def add(self, item, unique: bool = True) -> int:
+        """
+        Registers an item and returns its id.
+
+        With ``unique`` false a clashing key is tolerated and keeps pointing
+        at the first item, which is how records written before keys were
+        enforced are restored.
+        """
+        item_id = self._ids.get(item)
+        if item_id is not None:
+            return item_id
+        key = self._key(item)
+        if key is not None and key in self._keys and unique:
+            raise ValueError(f"Duplicate {self._label}: {key}")
+        item_id = self._ids[item] = len(self._items)
+        self._items.append(item)
+        if key is not None:
+            self._keys.setdefault(key, item_id)
+        return item_id
+
+    def id_of(self, item) -> int:
+        """
+        Retrieves the id of a registered item, or None.
+        """
+        return self._ids.get(item)
+
+    def by_key(self, key):
+        """
+        Retrieves the item with the given natural key, or None.
+        """
+        item_id = self._keys.get(key)
+        return None if item_id is None else self._items[item_id]
+
+
+class CustomerRegistry(Registry):
+    """
+    Represents the customers, keyed by case-insensitive email.
+
+    Examples:
+        >>> customers = CustomerRegistry()
+        >>> customers.add(Customer("Alice", "1234567890", "alice@example.com"))
+        0
+        >>> customers.by_email("Alice@Example.com").name
+        'Alice'
+        >>> customers.add(Customer("Alice B", "5550001111", "ALICE@example.com"))
+        Traceback (most recent call last):
+        ...
+        ValueError: Duplicate customer email: alice@example.com
+    """
+    def __init__(self):
+        super().__init__(lambda customer: customer.email.casefold(), "customer email")
+
+    def by_email(self, email: str):
+        """
+        Retrieves the customer with the given email, or None.
+        """
+        return self.by_key(email.casefold())
+
+
+class StockRegistry(Registry):
+    """
+    Represents the books, keyed by ISBN when they have one.
+
+    Examples:
+        >>> stocks = StockRegistry()
+        >>> stocks.add(Stock("1984", "George Orwell", 8.99, isbn="978-0-452-28423-4"))
+        0
+        >>> stocks.add(Stock("1984", "George Orwell", 9.99))
+        1
+        >>> stocks.by_isbn("9780452284234").price, stocks[1].price
+        (8.99, 9.99)
+    """
+    def __init__(self):
+        super().__init__(lambda stock: stock.isbn, "ISBN")
+
+    def by_isbn(self, isbn: str):
+        """
+        Retrieves the book with the given ISBN, with or without hyphens, or None.
+        """
+        return self.by_key(normalize_isbn(isbn))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,252 @@
+import multiprocessing
+import os
+import threading
+import zlib
+
+from bookstore_concurrent import InvoiceNumberAllocator
+from bookstore_core import BookStore, Shipping
+
+PARTITIONS = ("invoice_nbr", "customer")
+
+
+class ShardedBookStore:
+    """
+    Represents invoices partitioned across worker processes.
+
+    Each of ``workers`` processes owns a ``BookStore`` and talks to this
+    router over a pipe, so shards run on separate cores with separate GILs.
+    Invoices are placed by CRC32 of the invoice number or, with
+    ``partition="customer"``, of the customer's email; queries keyed by the
+    partition go to one shard and the rest are scattered to every shard
+    and gathered.  Requests to all shards are sent before any reply is
+    read, so the shards work in parallel.  ``place_orders`` ships the raw
+    orders and prices them in the shards.
+
+    Objects cross process boundaries by pickling: invoices returned by the
+    router are copies, and books and customers are matched by email rather
+    than identity.  The router may be shared between threads; requests are
+    serialized.
+
+    Examples:
+        >>> from datetime import date
+        >>> from bookstore_core import Customer, Stock
+        >>> customer = Customer("Alice", "1234567890", "alice@example.com")
+        >>> stock = Stock("1984", "George Orwell", 8.99)
+        >>> with ShardedBookStore(workers=2) as bookstore:
+        ...     invoices = bookstore.place_orders([(customer, stock, i % 2 == 0, date(2025, 1, 1)) for i in range(4)])
+        ...     print(len(bookstore), bookstore.search_invoice("INV0003").invoice(), bookstore.revenue)
+        4 14.44 54.76
+    """
+    def __init__(self, workers: int = None, partition: str = "invoice_nbr"):
+        if partition not in PARTITIONS:
+            raise ValueError(f"Unknown partition: {partition}")
+        self.partition = partition
+        self._lock = threading.Lock()
+        self._manual = set()
+        self._allocator = InvoiceNumberAllocator(is_taken=self._manual.__contains__)
+        self._conns = []
+        self._processes = []
+        context = multiprocessing.get_context()
+        for _ in range(workers or os.cpu_count() or 1):
+            conn, child = context.Pipe()
+            process = context.Process(target=_serve, args=(child,), daemon=True)
+            process.start()
+            child.close()
+            self._conns.append(conn)
+            self._processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return sum(self._scatter("len"))
+
+    def __contains__(self, invoice_nbr) -> bool:
+        return self.search_invoice(invoice_nbr) is not None
+
+    def add_invoice(self, invoice):
+        """
+        Adds an invoice, rejecting duplicate invoice numbers.
+        """
+        if self.partition == "customer" and invoice.invoice_nbr in self:
+            raise ValueError(f"Duplicate invoice number: {invoice.invoice_nbr}")
+        self._call(self._shard_of(_partition_key(self.partition, invoice)), "add_invoice", invoice)
+        self._manual.add(invoice.invoice_nbr)
+
+    def place_orders(self, batch, summary: bool = False) -> list:
+        """
+        Places a batch of ``(customer, stock, is_urgent, ship_date)`` orders.
+
+        Items may also carry a zone, weight and carrier, as for
+        ``BookStore.place_orders``.
+
+        Each shard receives and prices its part of the batch in one request.
+        The batch is all-or-nothing: if any shard rejects its part, the parts
+        other shards stored are removed again before the error is raised.
+
+        The shards reply with copies of the invoices they stored, and
+        pickling those graphs keeps the router busy.  With ``summary=True``
+        they reply with ``(invoice_nbr, total_cents)`` pairs instead, which
+        are returned in batch order.
+
+        Examples:
+            >>> from datetime import date
+            >>> from bookstore_core import Customer, Stock
+            >>> customer = Customer("Alice", "1234567890", "alice@example.com")
+            >>> stock = Stock("1984", "George Orwell", 8.99)
+            >>> with ShardedBookStore(workers=2) as bookstore:
+            ...     bookstore.place_orders([(customer, stock, False, date(2025, 1, 1))] * 2, summary=True)
+            [('INV0001', 1294), ('INV0002', 1294)]
+        """
+        batch = list(batch)
+        invoice_nbrs = self._allocator.allocate(len(batch))
+        parts = {}
+        for position, (invoice_nbr, order) in enumerate(zip(invoice_nbrs, batch)):
+            key = invoice_nbr if self.partition == "invoice_nbr" else order[0].email
+            nbrs, orders, positions = parts.setdefault(self._shard_of(key), ([], [], []))
+            nbrs.append(invoice_nbr)
+            orders.append(order)
+            positions.append(position)
+        replies = self._exchange({shard: ("place_orders", nbrs, orders, summary)
+                                  for shard, (nbrs, orders, _) in parts.items()})
+        failures = [result for ok, result in replies.values() if not ok]
+        if failures:
+            self._gather({shard: ("remove_invoices", parts[shard][0])
+                          for shard, (ok, _) in replies.items() if ok})
+            raise failures[0]
+        replies = {shard: result for shard, (_, result) in replies.items()}
+        invoices = [None] * len(batch)
+        for shard, placed in replies.items():
+            for position, invoice in zip(parts[shard][2], placed):
+                invoices[position] = invoice
+        Shipping.add_urgent(sum(1 for order in batch if order[2]))
+        return invoices
+
+    def search_invoice(self, invoice_nbr: str):
+        """
+        Searches for an invoice by its number.
+        """
+        if self.partition == "invoice_nbr":
+            return self._call(self._shard_of(invoice_nbr), "search_invoice", invoice_nbr)
+        return next((invoice for invoice in self._scatter("search_invoice", invoice_nbr)
+                     if invoice is not None), None)
+
+    def invoices_for_customer(self, email: str) -> list:
+        """
+        Retrieves the invoices of the customer with the given email.
+        """
+        if self.partition == "customer":
+            return self._call(self._shard_of(email), "invoices_for_customer", email)
+        return [invoice for part in self._scatter("invoices_for_customer", email) for invoice in part]
+
+    @property
+    def revenue(self) -> float:
+        """
+        Retrieves the total of every invoice.
+        """
+        return sum(cents for _, _, cents in self._scatter("tally")) / 100
+
+    def stats(self) -> dict:
+        """
+        Summarizes the invoices across shards, like ``BookStore.stats``.
+        """
+        return BookStore.summarize(self._scatter("tally"))
+
+    def customer_revenue(self, email: str) -> float:
+        """
+        Retrieves the total spent by the customer with the given email.
+        """
+        if self.partition == "customer":
+            return self._call(self._shard_of(email), "customer_cents", email) / 100
+        return sum(self._scatter("customer_cents", email)) / 100
+
+    def close(self):
+        """
+        Stops the worker processes.
+        """
+        with self._lock:
+            for conn in self._conns:
+                conn.send(None)
+                conn.close()
+            for process in self._processes:
+                process.join()
+            self._conns = []
+            self._processes = []
+
+    def _shard_of(self, key: str) -> int:
+        return zlib.crc32(key.encode()) % len(self._conns)
+
+    def _call(self, shard: int, method: str, *args):
+        return self._gather({shard: (method, *args)})[shard]
+
+    def _scatter(self, method: str, *args) -> list:
+        replies = self._gather({shard: (method, *args) for shard in range(len(self._conns))})
+        return [replies[shard] for shard in range(len(self._conns))]
+
+    def _gather(self, requests: dict) -> dict:
+        replies = self._exchange(requests)
+        for ok, result in replies.values():
+            if not ok:
+                raise result
+        return {shard: result for shard, (_, result) in replies.items()}
+
+    def _exchange(self, requests: dict) -> dict:
+        # Sends every request before reading any reply; replies are
+        # ``(ok, result)`` pairs, with the exception as result on failure.
+        with self._lock:
+            for shard, request in requests.items():
+                self._conns[shard].send(request)
+            return {shard: self._conns[shard].recv() for shard in requests}
+
+
+def _partition_key(partition: str, invoice) -> str:
+    if partition == "invoice_nbr":
+        return invoice.invoice_nbr
+    return invoice.ship_order.order.customer.email
+
+
+def _place_orders(bookstore: BookStore, invoice_nbrs: list, batch: list, summary: bool) -> list:
+    invoices = bookstore.price_orders(invoice_nbrs, batch)
+    bookstore.store_invoices(invoices)
+    if summary:
+        return [(invoice.invoice_nbr, invoice.total_cents) for invoice in invoices]
+    return invoices
+
+
+def _remove_invoices(bookstore: BookStore, invoice_nbrs: list):
+    for invoice_nbr in invoice_nbrs:
+        bookstore.remove_invoice(invoice_nbr)
+
+
+_HANDLERS = {
+    "len": len,
+    "add_invoice": BookStore.add_invoice,
+    "place_orders": _place_orders,
+    "remove_invoices": _remove_invoices,
+    "search_invoice": BookStore.search_invoice,
+    "invoices_for_customer": BookStore.invoices_for_customer,
+    "tally": BookStore.tally,
+    "customer_cents": BookStore.customer_revenue_cents,
+}
+
+
+def _serve(conn):
+    bookstore = BookStore()
+    while True:
+        request = conn.recv()
+        if request is None:
+            break
+        method, *args = request
+        try:
+            conn.send((True, _HANDLERS[method](bookstore, *args)))
+        except Exception as e:
+            conn.send((False, e))
+    conn.close()
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
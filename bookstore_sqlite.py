@@ -0,0 +1,372 @@
+import queue
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date
+from itertools import groupby
+from operator import itemgetter
+
+from bookstore_core import BookStore, Customer, Stock, Order, Shipping, Invoice, format_invoice_nbr
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    email TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS stocks (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    author TEXT NOT NULL,
+    isbn TEXT,
+    price_cents INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    customer_id INTEGER NOT NULL REFERENCES customers(id)
+);
+CREATE TABLE IF NOT EXISTS order_lines (
+    order_id INTEGER NOT NULL REFERENCES orders(id),
+    line INTEGER NOT NULL,
+    stock_id INTEGER NOT NULL REFERENCES stocks(id),
+    quantity INTEGER NOT NULL,
+    price_cents INTEGER NOT NULL,
+    PRIMARY KEY (order_id, line)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS shipping (
+    id INTEGER PRIMARY KEY,
+    order_id INTEGER NOT NULL REFERENCES orders(id),
+    ship_date TEXT NOT NULL,
+    ship_cost_cents INTEGER NOT NULL,
+    is_urgent INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS invoices (
+    invoice_nbr TEXT PRIMARY KEY,
+    shipping_id INTEGER NOT NULL REFERENCES shipping(id),
+    total_cents INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS invoice_seq (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    next_seq INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS stocks_isbn ON stocks(isbn);
+CREATE UNIQUE INDEX IF NOT EXISTS stocks_name_author ON stocks(name, author) WHERE isbn IS NULL;
+CREATE INDEX IF NOT EXISTS orders_customer ON orders(customer_id);
+CREATE INDEX IF NOT EXISTS order_lines_stock ON order_lines(stock_id);
+CREATE INDEX IF NOT EXISTS shipping_date ON shipping(ship_date);
+CREATE INDEX IF NOT EXISTS invoices_shipping ON invoices(shipping_id);
+"""
+
+# Bumped whenever a table changes shape; older files are refused on open.
+SCHEMA_VERSION = 3
+
+_INVOICE_NBR = re.compile(r"INV\d+")
+
+_MAX_INVOICE_SEQ = ("SELECT MAX(CAST(SUBSTR(invoice_nbr, 4) AS INTEGER)) FROM invoices "
+                    "WHERE invoice_nbr GLOB 'INV[0-9]*'")
+
+_SELECT_INVOICES = """
+SELECT i.invoice_nbr, s.ship_date, s.ship_cost_cents, s.is_urgent,
+       c.name, c.phone, c.email, k.id, k.name, k.author, l.price_cents, k.isbn, l.quantity
+FROM invoices i
+JOIN shipping s ON s.id = i.shipping_id
+JOIN orders o ON o.id = s.order_id
+JOIN customers c ON c.id = o.customer_id
+LEFT JOIN order_lines l ON l.order_id = o.id
+LEFT JOIN stocks k ON k.id = l.stock_id
+"""
+
+# Every query returns one row per order line, grouped by invoice.
+_ORDER_BY = " ORDER BY i.rowid, l.line"
+
+
+class InvoiceCursor:
+    """
+    Represents a lazy, re-iterable view over the invoices of a SQLiteBookStore.
+
+    Each iteration streams rows from a fresh cursor, so invoices are built
+    one at a time instead of being materialized into a list.
+    """
+    def __init__(self, bookstore, batch_size: int = 1000):
+        self._bookstore = bookstore
+        self._batch_size = batch_size
+
+    def __len__(self) -> int:
+        return len(self._bookstore)
+
+    def __iter__(self):
+        with self._bookstore._reader() as conn:
+            cursor = conn.execute(_SELECT_INVOICES + _ORDER_BY)
+            for _, rows in groupby(self._rows(cursor), itemgetter(0)):
+                yield self._bookstore._build_invoice(list(rows))
+
+    def _rows(self, cursor):
+        while True:
+            rows = cursor.fetchmany(self._batch_size)
+            if not rows:
+                break
+            yield from rows
+
+
+class SQLiteBookStore:
+    """
+    Represents an invoice repository backed by a SQLite database file.
+
+    Customers, books, orders, shipping and invoices live in indexed tables.
+    The database runs in WAL mode so readers never block the writer; writes
+    go through one connection under a lock and reads borrow a connection
+    from a small pool.  Every statement is a constant SQL string, so each
+    connection's statement cache reuses its prepared form.  ``add_invoices``
+    and ``place_orders`` insert a whole batch in one transaction with
+    ``executemany``.  Customers are keyed by email and books by ISBN, or by
+    name and author when they have none; money is stored in integer cents.
+    Each order line keeps its quantity and the price the book sold at, and
+    invoices are read back at that price; a book's own row keeps the price
+    it was first stored with.
+    Invoice numbers come from a
+    one-row sequence table, seeded from the highest ``INV`` number when an
+    older database is first opened and bumped past any such number added
+    by hand.
+
+    Examples:
+        >>> import os, tempfile
+        >>> from datetime import date
+        >>> path = os.path.join(tempfile.mkdtemp(), "bookstore.db")
+        >>> bookstore = SQLiteBookStore(path)
+        >>> customer = Customer("Alice", "1234567890", "alice@example.com")
+        >>> stock = Stock("1984", "George Orwell", 8.99)
+        >>> shipping = Shipping(Order(customer, stock), date(2025, 1, 1))
+        >>> shipping.set_ship_cost(shipping.calc_ship_cost(False))
+        >>> bookstore.add_invoice(Invoice("INV001", stock, shipping))
+        >>> bookstore.search_invoice("INV001").invoice()
+        12.94
+        >>> [inv.invoice_nbr for inv in bookstore.get_invoices]
+        ['INV001']
+        >>> bookstore.allocate_invoice_nbrs(2), bookstore.allocate_invoice_nbrs()
+        (['INV0002', 'INV0003'], ['INV0004'])
+        >>> bookstore.close()
+    """
+    def __init__(self, path: str, readers: int = 4):
+        self.path = path
+        self._writer = self._connect()
+        version = self._writer.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION and self._writer.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'invoices'").fetchone():
+            self._writer.close()
+            raise ValueError(f"Database schema version {version} is not {SCHEMA_VERSION}: {path}")
+        self._writer.executescript(SCHEMA)
+        self._writer.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        with self._writer as conn:
+            if conn.execute("SELECT 1 FROM invoice_seq").fetchone() is None:
+                conn.execute("INSERT INTO invoice_seq (id, next_seq) VALUES (1, ?)",
+                             ((conn.execute(_MAX_INVOICE_SEQ).fetchone()[0] or 0) + 1,))
+        self._write_lock = threading.Lock()
+        self._pool = queue.Queue()
+        for _ in range(readers):
+            self._pool.put(self._connect())
+        self._customer_ids = {}
+        self._stock_ids = {}
+        self._stocks = {}
+
+    def __len__(self) -> int:
+        with self._reader() as conn:
+            return conn.execute("SELECT COUNT(*) FROM invoices").fetchone()[0]
+
+    def __contains__(self, invoice_nbr) -> bool:
+        with self._reader() as conn:
+            row = conn.execute("SELECT 1 FROM invoices WHERE invoice_nbr = ?", (invoice_nbr,)).fetchone()
+        return row is not None
+
+    @property
+    def get_invoices(self) -> InvoiceCursor:
+        """
+        Retrieves the invoices as a lazy cursor-backed iterable.
+        """
+        return InvoiceCursor(self)
+
+    def add_invoice(self, invoice: Invoice):
+        """
+        Adds an invoice to the repository.
+        """
+        self.add_invoices([invoice])
+
+    def add_invoices(self, invoices):
+        """
+        Adds a batch of invoices in a single transaction.
+        """
+        invoices = list(invoices)
+        with self._write_lock:
+            numbers = [invoice.invoice_nbr for invoice in invoices]
+            for i in range(0, len(numbers), 500):
+                chunk = numbers[i:i + 500]
+                row = self._writer.execute(
+                    f"SELECT invoice_nbr FROM invoices WHERE invoice_nbr IN ({', '.join('?' * len(chunk))})",
+                    chunk).fetchone()
+                if row is not None:
+                    raise ValueError(f"Duplicate invoice number: {row[0]}")
+            self._write(invoices)
+
+    def allocate_invoice_nbrs(self, count: int = 1) -> list:
+        """
+        Reserves a block of consecutive invoice numbers after the highest used.
+        """
+        with self._write_lock:
+            return self._allocate(count)
+
+    def place_orders(self, batch) -> list:
+        """
+        Places a batch of ``(customer, books, is_urgent, ship_date)`` orders.
+
+        ``books`` is a Stock or ``(stock, quantity)`` pairs, as for
+        ``BookStore.place_orders``.
+        """
+        batch = list(batch)
+        with self._write_lock:
+            invoices = BookStore.price_orders(self._allocate(len(batch)), batch)
+            self._write(invoices)
+        return invoices
+
+    def search_invoice(self, invoice_nbr: str):
+        """
+        Searches for an invoice by its number.
+        """
+        with self._reader() as conn:
+            rows = conn.execute(_SELECT_INVOICES + " WHERE i.invoice_nbr = ?" + _ORDER_BY,
+                                (invoice_nbr,)).fetchall()
+        return self._build_invoice(rows) if rows else None
+
+    def invoices_for_customer(self, email: str) -> list:
+        """
+        Retrieves the invoices of the customer with the given email.
+        """
+        with self._reader() as conn:
+            rows = conn.execute(_SELECT_INVOICES + " WHERE c.email = ?" + _ORDER_BY, (email,)).fetchall()
+        return [self._build_invoice(list(group)) for _, group in groupby(rows, itemgetter(0))]
+
+    def close(self):
+        """
+        Closes the writer and every pooled reader connection.
+        """
+        self._writer.close()
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def _allocate(self, count: int) -> list:
+        # Called under the write lock; the reservation commits on its own, so
+        # numbers of a batch that later fails are skipped, not reused.
+        with self._writer as conn:
+            start = conn.execute("SELECT next_seq FROM invoice_seq").fetchone()[0]
+            conn.execute("UPDATE invoice_seq SET next_seq = ?", (start + count,))
+        return [format_invoice_nbr(seq) for seq in range(start, start + count)]
+
+    @contextmanager
+    def _reader(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def _write(self, invoices: list):
+        # Ids cached during a transaction that rolls back must be forgotten.
+        new_emails, new_keys = [], []
+        try:
+            with self._writer as conn:
+                self._insert(conn, invoices, new_emails, new_keys)
+        except Exception:
+            for email in new_emails:
+                self._customer_ids.pop(email, None)
+            for key in new_keys:
+                self._stock_ids.pop(key, None)
+            raise
+
+    def _insert(self, conn: sqlite3.Connection, invoices: list, new_emails: list, new_keys: list):
+        for invoice in invoices:
+            customer = invoice.ship_order.order.customer
+            if customer.email not in self._customer_ids:
+                self._customer_ids[customer.email] = self._customer_id(conn, customer)
+                new_emails.append(customer.email)
+            for line in invoice.ship_order.order.lines:
+                key = _stock_key(line.stock)
+                if key not in self._stock_ids:
+                    self._stock_ids[key] = self._stock_id(conn, line.stock)
+                    new_keys.append(key)
+        order_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM orders").fetchone()[0]
+        shipping_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM shipping").fetchone()[0]
+        orders, lines, shipments, rows = [], [], [], []
+        for invoice in invoices:
+            shipping = invoice.ship_order
+            order_id += 1
+            shipping_id += 1
+            orders.append((order_id, self._customer_ids[shipping.order.customer.email]))
+            lines.extend((order_id, i, self._stock_ids[_stock_key(line.stock)], line.quantity, line.stock.price_cents)
+                         for i, line in enumerate(shipping.order.lines))
+            shipments.append((shipping_id, order_id, shipping.ship_date.isoformat(),
+                              shipping.ship_cost_cents, int(shipping.is_urgent)))
+            rows.append((invoice.invoice_nbr, shipping_id, invoice.total_cents))
+        conn.executemany("INSERT INTO orders (id, customer_id) VALUES (?, ?)", orders)
+        conn.executemany("INSERT INTO order_lines (order_id, line, stock_id, quantity, price_cents) "
+                         "VALUES (?, ?, ?, ?, ?)", lines)
+        conn.executemany("INSERT INTO shipping (id, order_id, ship_date, ship_cost_cents, is_urgent) "
+                         "VALUES (?, ?, ?, ?, ?)", shipments)
+        conn.executemany("INSERT INTO invoices (invoice_nbr, shipping_id, total_cents) VALUES (?, ?, ?)", rows)
+        seqs = [int(invoice.invoice_nbr[3:]) for invoice in invoices if _INVOICE_NBR.fullmatch(invoice.invoice_nbr)]
+        if seqs:
+            conn.execute("UPDATE invoice_seq SET next_seq = MAX(next_seq, ?)", (max(seqs) + 1,))
+
+    def _customer_id(self, conn: sqlite3.Connection, customer: Customer) -> int:
+        conn.execute("INSERT OR IGNORE INTO customers (name, phone, email) VALUES (?, ?, ?)",
+                     (customer.name, customer.phone, customer.email))
+        return conn.execute("SELECT id FROM customers WHERE email = ?", (customer.email,)).fetchone()[0]
+
+    def _stock_id(self, conn: sqlite3.Connection, stock: Stock) -> int:
+        # Finds the row of a book seen before, under this or an earlier
+        # instance, or inserts it.
+        if stock.isbn is not None:
+            row = conn.execute("SELECT id FROM stocks WHERE isbn = ?", (stock.isbn,)).fetchone()
+        else:
+            row = conn.execute("SELECT id FROM stocks WHERE isbn IS NULL AND name = ? AND author = ?",
+                               (stock.name, stock.author)).fetchone()
+        if row is None:
+            return conn.execute("INSERT INTO stocks (name, author, isbn, price_cents) VALUES (?, ?, ?, ?)",
+                                (stock.name, stock.author, stock.isbn, stock.price_cents)).lastrowid
+        return row[0]
+
+    def _build_invoice(self, rows: list) -> Invoice:
+        # One row per order line; an emptied order has one row of NULL line columns.
+        invoice_nbr, ship_date, ship_cost_cents, is_urgent, name, phone, email = rows[0][:7]
+        lines = []
+        for *_, stock_id, title, author, price_cents, isbn, quantity in rows:
+            if stock_id is None:
+                continue
+            # Books read back are shared per (row, sold price); one whose
+            # price a caller has since changed is replaced.
+            stock = self._stocks.get((stock_id, price_cents))
+            if stock is None or stock.price_cents != price_cents:
+                stock = self._stocks[stock_id, price_cents] = Stock.from_trusted(title, author, price_cents / 100,
+                                                                                 isbn)
+            lines.append((stock, quantity))
+        order = Order.from_lines(Customer.from_trusted(name, phone, email), lines)
+        stock = order.stock
+        shipping = Shipping(order, date.fromisoformat(ship_date))
+        shipping.ship_cost_cents = ship_cost_cents
+        shipping.is_urgent = bool(is_urgent)
+        return Invoice(invoice_nbr, stock, shipping)
+
+
+def _stock_key(stock: Stock) -> tuple:
+    return (stock.isbn,) if stock.isbn is not None else (stock.name, stock.author)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,315 @@
+import os
+import pickle
+import struct
+from datetime import date
+
+from bookstore_core import Customer, Stock, Order, Shipping, Invoice, BookStore, _book_lines
+from bookstore_registry import CustomerRegistry, StockRegistry
+
+SNAPSHOT_FILE = "snapshot.bin"
+LOG_FILE = "wal.log"
+
+_CUSTOMER, _STOCK, _INVOICE, _PRICE, _EDIT = 1, 2, 3, 4, 5
+_HEADER = struct.Struct("<IB")
+
+
+class StorageEngine:
+    """
+    Represents a durable home for customers, books and invoices.
+
+    Every change is appended to a write-ahead log (``wal.log``) of
+    length-prefixed records that is fsynced once per ``sync_every`` records.
+    After ``snapshot_every`` records the whole state is written to a compact
+    binary snapshot (``snapshot.bin``) and the log is truncated.  ``load``
+    restores the latest snapshot and replays only the log records written
+    after it; a torn record at the end of the log is discarded.
+
+    Customers and books live in registries, and invoice records refer to
+    them by registry id.  New customers must have unused emails and new
+    books unused ISBNs; records written before that rule are restored as
+    they were.  The engine observes its books and logs each price change,
+    and logs the new lines and shipping cost of a stored invoice whose
+    order or shipping is edited (an order may be emptied), so totals read
+    the same after a reload.
+
+    Examples:
+        >>> import tempfile
+        >>> from datetime import date
+        >>> directory = tempfile.mkdtemp()
+        >>> storage = StorageEngine(directory).load()
+        >>> alice = storage.add_customer(Customer("Alice", "1234567890", "alice@example.com"))
+        >>> book = storage.add_stock(Stock("1984", "George Orwell", 8.99))
+        >>> invoice, = storage.place_orders([(alice, book, True, date(2025, 1, 1))])
+        >>> book.price = 9.99
+        >>> storage.close()
+        >>> restored = StorageEngine(directory).load()
+        >>> restored.bookstore.search_invoice(invoice.invoice_nbr).invoice()
+        15.44
+        >>> [c.name for c in restored.customers]
+        ['Alice']
+        >>> restored.close()
+    """
+    def __init__(self, directory: str, sync_every: int = 64, snapshot_every: int = 100_000):
+        self.directory = directory
+        self.sync_every = sync_every
+        self.snapshot_every = snapshot_every
+        self.customers = CustomerRegistry()
+        self.stocks = StockRegistry()
+        self.bookstore = _LoggedBookStore(self)
+        # (order revision, shipping revision) last logged, for invoices
+        # where either is not zero.
+        self._revisions = {}
+        self._seq = 0
+        self._unsynced = 0
+        self._since_snapshot = 0
+        self._log = None
+
+    def load(self):
+        """
+        Restores the snapshot and log tail, then opens the log for appending.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        snapshot_seq = self._load_snapshot()
+        log_path = os.path.join(self.directory, LOG_FILE)
+        if os.path.exists(log_path):
+            self._replay(log_path, snapshot_seq)
+        self._log = open(log_path, "ab")
+        for stock in self.stocks:
+            stock.subscribe(self)
+        return self
+
+    def add_customer(self, customer: Customer) -> Customer:
+        """
+        Stores a customer and logs it, rejecting a duplicate email.
+        """
+        if customer not in self.customers:
+            self._log_customer(customer)
+            self._maybe_snapshot()
+        return customer
+
+    def add_stock(self, stock: Stock) -> Stock:
+        """
+        Stores a book and logs it, rejecting a duplicate ISBN.
+        """
+        if stock not in self.stocks:
+            self._log_stock(stock)
+            self._maybe_snapshot()
+        return stock
+
+    def add_invoice(self, invoice: Invoice):
+        """
+        Stores an invoice and logs it, along with any new customer or book.
+        """
+        order = invoice.ship_order.order
+        self._register(order.customer, [invoice.stock] + [line.stock for line in order.lines])
+        self.bookstore.add_invoice(invoice)
+        self._log_invoice(invoice)
+        self._maybe_snapshot()
+
+    def place_orders(self, batch) -> list:
+        """
+        Places a batch of orders through the bookstore and logs the invoices.
+        """
+        batch = list(batch)
+        for customer, books, *_ in batch:
+            self._register(customer, [stock for stock, _ in _book_lines(books)])
+        invoices = self.bookstore.place_orders(batch)
+        for invoice in invoices:
+            self._log_invoice(invoice)
+        self._maybe_snapshot()
+        return invoices
+
+    def sync(self):
+        """
+        Forces the buffered log records to disk.
+        """
+        if self._log is not None and self._unsynced:
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            self._unsynced = 0
+
+    def snapshot(self):
+        """
+        Writes the full state to a new snapshot and truncates the log.
+        """
+        state = (
+            self._seq,
+            [(c.name, c.phone, c.email) for c in self.customers],
+            [(s.name, s.author, s.price, s.isbn) for s in self.stocks],
+            [self._invoice_row(invoice) for invoice in self.bookstore.get_invoices],
+        )
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self.sync()
+        self._log.truncate(0)
+        self._since_snapshot = 0
+
+    def close(self):
+        """
+        Syncs and closes the log.
+        """
+        if self._log is not None:
+            self.sync()
+            self._log.close()
+            self._log = None
+
+    def changed(self, stock: Stock):
+        """
+        Logs the new price of a stored book.
+        """
+        if self._log is not None:
+            self._append(_PRICE, (self.stocks.id_of(stock), stock.price_cents))
+
+    def _invoice_changed(self, invoice: Invoice):
+        # A price change reaches every invoice of the book but moves no
+        # revision, so only real edits are logged.
+        shipping = invoice.ship_order
+        revisions = (shipping.order.revision, shipping.revision)
+        if self._log is None or revisions == self._revisions.get(invoice.invoice_nbr, (0, 0)):
+            return
+        self._revisions[invoice.invoice_nbr] = revisions
+        self._register(shipping.order.customer, [line.stock for line in shipping.order.lines])
+        lines = tuple((self.stocks.id_of(line.stock), line.quantity) for line in shipping.order.lines)
+        self._append(_EDIT, (invoice.invoice_nbr, shipping.ship_cost_cents, lines))
+
+    def _register(self, customer: Customer, stocks: list):
+        # Logs new customers and books ahead of the invoices that use them,
+        # so a duplicate email or ISBN fails before anything is stored.
+        if customer not in self.customers:
+            self._log_customer(customer)
+        for stock in stocks:
+            if stock not in self.stocks:
+                self._log_stock(stock)
+
+    def _log_invoice(self, invoice: Invoice):
+        shipping = invoice.ship_order
+        if shipping.order.revision or shipping.revision:
+            self._revisions[invoice.invoice_nbr] = (shipping.order.revision, shipping.revision)
+        self._append(_INVOICE, self._invoice_row(invoice))
+
+    def _log_customer(self, customer: Customer):
+        self.customers.add(customer)
+        self._append(_CUSTOMER, (customer.name, customer.phone, customer.email))
+
+    def _log_stock(self, stock: Stock):
+        self.stocks.add(stock)
+        stock.subscribe(self)
+        self._append(_STOCK, (stock.name, stock.author, stock.price, stock.isbn))
+
+    def _invoice_row(self, invoice: Invoice) -> tuple:
+        shipping = invoice.ship_order
+        stock = invoice.stock
+        row = (invoice.invoice_nbr, self.customers.id_of(shipping.order.customer),
+               None if stock is None else self.stocks.id_of(stock), shipping.ship_cost, shipping.is_urgent,
+               shipping.ship_date.toordinal())
+        lines = shipping.order.lines
+        if len(lines) == 1 and lines[0].quantity == 1:
+            return row
+        # Multi-book and emptied orders add their (stock id, quantity) lines.
+        return row + (tuple((self.stocks.id_of(line.stock), line.quantity) for line in lines),)
+
+    def _append(self, kind: int, fields: tuple):
+        self._seq += 1
+        payload = pickle.dumps((self._seq, fields), protocol=pickle.HIGHEST_PROTOCOL)
+        self._log.write(_HEADER.pack(len(payload), kind) + payload)
+        self._unsynced += 1
+        self._since_snapshot += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def _maybe_snapshot(self):
+        # Only called between operations, so the snapshot never holds
+        # state whose log records have not been written yet.
+        if self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def _load_snapshot(self) -> int:
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as f:
+            seq, customers, stocks, invoices = pickle.load(f)
+        for fields in customers:
+            self.customers.add(Customer.from_trusted(*fields), unique=False)
+        for fields in stocks:
+            self.stocks.add(Stock.from_trusted(*fields), unique=False)
+        self.bookstore.store_invoices([self._build_invoice(fields) for fields in invoices])
+        self._seq = seq
+        return seq
+
+    def _replay(self, path: str, snapshot_seq: int):
+        with open(path, "r+b") as f:
+            data = f.read()
+            offset = 0
+            while offset + _HEADER.size <= len(data):
+                length, kind = _HEADER.unpack_from(data, offset)
+                end = offset + _HEADER.size + length
+                if end > len(data):
+                    break
+                try:
+                    seq, fields = pickle.loads(data[offset + _HEADER.size:end])
+                except Exception:
+                    break
+                if seq > snapshot_seq:
+                    self._apply(kind, fields)
+                    self._seq = seq
+                    self._since_snapshot += 1
+                offset = end
+            if offset < len(data):
+                f.truncate(offset)
+
+    def _apply(self, kind: int, fields: tuple):
+        if kind == _CUSTOMER:
+            self.customers.add(Customer.from_trusted(*fields), unique=False)
+        elif kind == _STOCK:
+            self.stocks.add(Stock.from_trusted(*fields), unique=False)
+        elif kind == _INVOICE:
+            self.bookstore.add_invoice(self._build_invoice(fields))
+        elif kind == _PRICE:
+            stock_key, price_cents = fields
+            self.stocks[stock_key].price_cents = price_cents
+        elif kind == _EDIT:
+            invoice_nbr, ship_cost_cents, lines = fields
+            invoice = self.bookstore.search_invoice(invoice_nbr)
+            shipping = invoice.ship_order
+            for line in shipping.order.lines:
+                shipping.order.remove_line(line.stock)
+            for stock_key, quantity in lines:
+                shipping.order.add_line(self.stocks[stock_key], quantity)
+            shipping.ship_cost_cents = ship_cost_cents
+            self._revisions[invoice_nbr] = (shipping.order.revision, shipping.revision)
+
+    def _build_invoice(self, fields: tuple) -> Invoice:
+        invoice_nbr, customer_key, stock_key, ship_cost, is_urgent, ship_day, *lines = fields
+        stock = None if stock_key is None else self.stocks[stock_key]
+        customer = self.customers[customer_key]
+        if lines:
+            order = Order.from_lines(customer, [(self.stocks[key], quantity) for key, quantity in lines[0]])
+        else:
+            order = Order(customer, stock)
+        shipping = Shipping(order, date.fromordinal(ship_day))
+        shipping.ship_cost = ship_cost
+        shipping.is_urgent = is_urgent
+        return Invoice(invoice_nbr, stock, shipping)
+
+
+class _LoggedBookStore(BookStore):
+    # Tells the engine about every stored invoice that changed, after
+    # re-crediting it.
+    def __init__(self, engine: StorageEngine):
+        super().__init__()
+        self._engine = engine
+
+    def changed(self, invoice):
+        super().changed(invoice)
+        if self.search_invoice(invoice.invoice_nbr) is invoice:
+            self._engine._invoice_changed(invoice)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
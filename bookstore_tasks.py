@@ -0,0 +1,155 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+
+class TaskRunner:
+    """
+    Runs core operations on worker threads and hands results back to the UI.
+
+    Workers never call back into the UI themselves: a finished task queues
+    its callback and ``poll`` runs the queued callbacks on the thread that
+    calls it.  Given Tk's ``root.after`` as ``after``, polling is scheduled
+    on the Tk main loop for as long as tasks are outstanding.  With the
+    default single worker, core operations run one at a time in submission
+    order, so the repositories need no locking of their own.
+
+    Examples:
+        >>> runner = TaskRunner()
+        >>> future = runner.submit(sum, [1, 2, 3], on_done=print)
+        >>> future.result()
+        6
+        >>> runner.poll()
+        6
+        >>> runner.close()
+    """
+    def __init__(self, after=None, workers: int = 1, interval: int = 50):
+        self._after = after
+        self._interval = interval
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bookstore")
+        self._callbacks = queue.SimpleQueue()
+        self._latest = {}
+        self._pending = 0
+        self._polling = False
+
+    def submit(self, fn, *args, on_done=None, on_error=None):
+        """
+        Runs ``fn(*args)`` on a worker and returns its Future.
+
+        ``on_done`` receives the result and ``on_error`` the exception, both
+        on the polling thread.
+        """
+        self._pending += 1
+        self._schedule()
+        return self._executor.submit(self._run, fn, args, on_done, on_error)
+
+    def submit_latest(self, key, fn, *args, on_done=None, on_error=None):
+        """
+        Submits a task that supersedes any earlier task with the same key.
+
+        A superseded task that has not started is cancelled, and one already
+        running has its callbacks dropped, so repeated searches only ever
+        report the latest answer.
+
+        Examples:
+            >>> runner = TaskRunner()
+            >>> first = runner.submit_latest("search", str.upper, "orw", on_done=print)
+            >>> second = runner.submit_latest("search", str.upper, "orwell", on_done=print)
+            >>> _ = second.result()
+            >>> runner.poll()
+            ORWELL
+            >>> runner.close()
+        """
+        previous = self._latest.get(key)
+        if previous is not None and previous.cancel():
+            self._callbacks.put((None, None, True))
+
+        def latest_only(callback):
+            if callback is None:
+                return None
+
+            def deliver(value):
+                if self._latest.get(key) is future:
+                    del self._latest[key]
+                    callback(value)
+            return deliver
+
+        future = self.submit(fn, *args, on_done=latest_only(on_done), on_error=latest_only(on_error))
+        self._latest[key] = future
+        return future
+
+    def run_batch(self, fn, items, total: int = None, chunk_size: int = 1000,
+                  on_progress=None, on_done=None, on_error=None):
+        """
+        Feeds ``items`` to ``fn`` a chunk at a time on a worker.
+
+        After each chunk ``on_progress`` receives ``(done, total)``, where
+        ``total`` is None when unknown; a poll only reports the most recent
+        progress.  ``on_done`` receives the number of items processed.
+
+        Examples:
+            >>> runner = TaskRunner()
+            >>> seen = []
+            >>> future = runner.run_batch(seen.extend, range(5), total=5, chunk_size=2, on_done=print)
+            >>> future.result(), seen
+            (5, [0, 1, 2, 3, 4])
+            >>> runner.poll()
+            5
+            >>> runner.close()
+        """
+        def job():
+            done = 0
+            it = iter(items)
+            for chunk in iter(lambda: list(islice(it, chunk_size)), []):
+                fn(chunk)
+                done += len(chunk)
+                if on_progress is not None:
+                    self._callbacks.put((on_progress, (done, total), False))
+            return done
+        return self.submit(job, on_done=on_done, on_error=on_error)
+
+    def poll(self):
+        """
+        Runs the callbacks of finished tasks on the calling thread.
+        """
+        messages = []
+        while True:
+            try:
+                messages.append(self._callbacks.get_nowait())
+            except queue.Empty:
+                break
+        last_progress = {id(callback): i for i, (callback, _, final) in enumerate(messages) if not final}
+        for i, (callback, value, final) in enumerate(messages):
+            if final:
+                self._pending -= 1
+            elif last_progress[id(callback)] != i:
+                continue
+            if callback is not None:
+                callback(value)
+        self._polling = False
+        self._schedule()
+
+    def close(self, wait: bool = True):
+        """
+        Stops the workers, by default after the submitted tasks finish.
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _schedule(self):
+        if self._after is not None and self._pending and not self._polling:
+            self._polling = True
+            self._after(self._interval, self.poll)
+
+    def _run(self, fn, args: tuple, on_done, on_error):
+        try:
+            result = fn(*args)
+        except Exception as e:
+            self._callbacks.put((on_error, e, True))
+            raise
+        self._callbacks.put((on_done, result, True))
+        return result
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,150 @@
+from collections import namedtuple
+from functools import cache
+
+from bookstore_core import Customer, Person, Product, Stock, normalize_isbn, to_cents
+
+# One check of a setter: ``invalid(value)`` is true for a value the setter
+# rejects with ``message``, which may refer to the value as {value}.
+Rule = namedtuple("Rule", "field invalid message")
+
+
+def _blank(value) -> bool:
+    return not value.strip()
+
+
+def _bad_email(value) -> bool:
+    return not value.strip() or "@" not in value
+
+
+def _bad_price(value) -> bool:
+    return to_cents(value) <= 0
+
+
+def _bad_isbn(value) -> bool:
+    if not value:
+        return False
+    try:
+        normalize_isbn(value)
+    except ValueError:
+        return True
+    return False
+
+
+PERSON_RULES = (
+    Rule("name", _blank, "Name cannot be empty."),
+    Rule("phone", _blank, "Phone cannot be empty."),
+    Rule("email", _bad_email, "Invalid email address."),
+)
+
+PRODUCT_RULES = (
+    Rule("name", _blank, "Product name cannot be empty."),
+    Rule("price", _bad_price, "Price must be greater than zero."),
+)
+
+STOCK_RULES = PRODUCT_RULES + (
+    Rule("author", _blank, "Author name cannot be empty."),
+    Rule("isbn", _bad_isbn, "Invalid ISBN: {value}"),
+)
+
+# The rules of each class in the order its constructor runs the setters,
+# and the constructor's own argument order.
+RULES = {
+    Person: (PERSON_RULES, ("name", "phone", "email")),
+    Customer: (PERSON_RULES, ("name", "phone", "email")),
+    Product: (PRODUCT_RULES, ("name", "price")),
+    Stock: (STOCK_RULES, ("name", "author", "price", "isbn")),
+}
+
+
+class Validator:
+    """
+    Represents the setter checks of one class, resolved once for reuse.
+
+    Calling the validator with constructor arguments raises the same
+    ValueError the constructor would, for the same first bad field, without
+    building an object.  ``check_columns`` validates whole columns at once.
+
+    Examples:
+        >>> validate = validator_for(Stock)
+        >>> validate("1984", "George Orwell", 8.99)
+        >>> validate("1984", " ", 0)
+        Traceback (most recent call last):
+        ...
+        ValueError: Price must be greater than zero.
+    """
+    __slots__ = ("cls", "fields", "_checks", "_defaults")
+
+    def __init__(self, cls: type):
+        rules, fields = RULES[cls]
+        self.cls = cls
+        self.fields = fields
+        self._checks = tuple((fields.index(rule.field), rule) for rule in rules)
+        self._defaults = (None,) * len(fields)
+
+    def __call__(self, *values):
+        values = values + self._defaults[len(values):]
+        for position, rule in self._checks:
+            value = values[position]
+            if rule.invalid(value):
+                raise ValueError(rule.message.format(value=value))
+
+    def check_columns(self, columns: dict) -> dict:
+        """
+        Validates equal-length columns of field values in one pass per field.
+
+        Returns ``{row: message}`` for the rejected rows, in row order, with
+        the message the constructor would raise for that row; a cell of the
+        wrong type, such as a price that is not a number, is reported with
+        the TypeError or AttributeError message it would raise.  A missing
+        column counts as blank: every row is rejected with the field's
+        message unless the field may be left empty, as an ISBN may.
+
+        Examples:
+            >>> validator_for(Customer).check_columns({
+            ...     "name": ["Alice", "Bob", ""],
+            ...     "phone": ["1234567890", "", "5550001111"],
+            ...     "email": ["alice@example.com", "bob", "carol@example.com"],
+            ... })
+            {1: 'Phone cannot be empty.', 2: 'Name cannot be empty.'}
+            >>> validator_for(Customer).check_columns({"name": ["Alice"], "email": ["alice@example.com"]})
+            {0: 'Phone cannot be empty.'}
+        """
+        rows = max(map(len, columns.values()), default=0)
+        errors = {}
+        for _, rule in self._checks:
+            column = columns.get(rule.field)
+            if not column:
+                if _required(rule):
+                    for row in range(rows):
+                        errors.setdefault(row, rule.message.format(value=None))
+                continue
+            invalid, message = rule.invalid, rule.message
+            for row, value in enumerate(column):
+                if row in errors:
+                    continue
+                try:
+                    if invalid(value):
+                        errors[row] = message.format(value=value)
+                except (TypeError, ValueError, AttributeError) as e:
+                    errors[row] = str(e)
+        return dict(sorted(errors.items()))
+
+
+def _required(rule: Rule) -> bool:
+    try:
+        return rule.invalid("")
+    except (TypeError, ValueError, AttributeError):
+        return True
+
+
+@cache
+def validator_for(cls: type) -> Validator:
+    """
+    Retrieves the shared validator of Person, Customer, Product or Stock.
+    """
+    return Validator(cls)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
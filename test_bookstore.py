@@ -1,4 +1,17 @@
-from bookstore_core import Customer, Stock, Order, Shipping, Invoice, BookStore
+from bookstore_core import Customer, Stock, Order, Shipping, Invoice, BookStore, OrderPipeline
+from bookstore_concurrent import ConcurrentBookStore
+from bookstore_storage import StorageEngine, LOG_FILE
+from bookstore_import import import_stocks
+from bookstore_inventory import Inventory
+from bookstore_sharded import ShardedBookStore
+from bookstore_sqlite import SQLiteBookStore
+from bookstore_metrics import instrumented
+from bookstore_mmap import InvoiceFile, export_invoices
+from bookstore_validation import validator_for
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import threading
 from datetime import date
 
 def test_bookstore():
@@ -50,6 +63,609 @@ def test_bookstore():
     else:
         print("Invoice INV004 not found")
 
+
+def test_bookstore_indexes():
+    alice = Customer("Alice", "1234567890", "alice@example.com")
+    bob = Customer("Bob", "9876543210", "bob@example.com")
+    stock1 = Stock("1984", "George Orwell", 8.99)
+    stock2 = Stock("Animal Farm", "George Orwell", 7.49)
+
+    bookstore = BookStore()
+    for nbr, customer, stock in [("INV001", alice, stock1), ("INV002", bob, stock1), ("INV003", alice, stock2)]:
+        shipping = Shipping(Order(customer, stock), date(2025, 1, 15))
+        bookstore.add_invoice(Invoice(nbr, stock, shipping))
+
+    assert len(bookstore) == 3
+    assert "INV002" in bookstore
+    assert [inv.invoice_nbr for inv in bookstore.invoices_for_customer("alice@example.com")] == ["INV001", "INV003"]
+    assert [inv.invoice_nbr for inv in bookstore.invoices_for_stock(stock1)] == ["INV001", "INV002"]
+
+    try:
+        bookstore.add_invoice(bookstore.search_invoice("INV001"))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("duplicate invoice number accepted")
+
+    removed = bookstore.remove_invoice("INV001")
+    assert removed.invoice_nbr == "INV001"
+    assert bookstore.search_invoice("INV001") is None
+    assert bookstore.remove_invoice("INV001") is None
+    assert [inv.invoice_nbr for inv in bookstore.invoices_for_customer("alice@example.com")] == ["INV003"]
+    assert [inv.invoice_nbr for inv in bookstore.get_invoices] == ["INV002", "INV003"]
+    assert bookstore.revenue == 16.48
+    assert bookstore.customer_revenue("alice@example.com") == 7.49
+    assert bookstore.stock_revenue(stock1) == 8.99
+    assert bookstore.daily_revenue(date(2025, 1, 15)) == (2, 16.48)
+    assert bookstore.monthly_revenue(2025, 1) == (2, 16.48)
+
+    bob.email = "robert@example.com"
+    bookstore.remove_invoice("INV002")
+    assert bookstore.invoices_for_customer("bob@example.com") == []
+    assert bookstore._customer_cents == {"alice@example.com": 749}
+
+    shipping = bookstore.search_invoice("INV003").ship_order
+    shipping.is_urgent = True
+    shipping.ship_date = date(2025, 2, 1)
+    stock2.price = 8.49
+    assert bookstore.daily_revenue(date(2025, 1, 15)) == (1, 8.49)
+    assert bookstore.remove_invoice("INV003") is not None
+    assert bookstore.stats()["urgent"] == 0 and bookstore.revenue == 0
+    assert bookstore._daily == {} and bookstore._monthly == {}
+
+
+def test_concurrent_bookstore():
+    customer = Customer("Alice", "1234567890", "alice@example.com")
+    stock = Stock("1984", "George Orwell", 8.99)
+    bookstore = ConcurrentBookStore(shards=4)
+    urgent_before = Shipping.count_urgent
+
+    def writer(_):
+        for i in range(200):
+            bookstore.place_orders([(customer, stock, i % 2 == 0, date(2025, 1, 15))])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(writer, range(8)))
+
+    numbers = [inv.invoice_nbr for inv in bookstore.get_invoices]
+    assert len(numbers) == len(set(numbers)) == 1600
+    assert len(bookstore.invoices_for_customer("alice@example.com")) == 1600
+    assert Shipping.count_urgent - urgent_before == 800
+    assert bookstore.stats() == {"count": 1600, "revenue": 21904.0, "urgent": 800,
+                                 "urgent_share": 0.5, "average_basket": 13.69}
+
+    repriced = Stock("Emma", "Jane Austen", 6.5)
+    done = threading.Event()
+
+    def pricer():
+        cents = 650
+        while not done.is_set():
+            cents = 650 + (cents - 649) % 50
+            repriced.price_cents = cents
+
+    thread = threading.Thread(target=pricer)
+    thread.start()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda _: [bookstore.place_orders([(customer, repriced, False, date(2025, 1, 16))] * 10)
+                                 for _ in range(50)], range(4)))
+    done.set()
+    thread.join()
+    invoices = bookstore.invoices_for_stock(repriced)
+    assert len(invoices) == 2000
+    assert all(inv.total_cents == repriced.price_cents + 395 for inv in invoices)
+    assert bookstore.stock_revenue(repriced) == len(invoices) * (repriced.price_cents + 395) / 100
+
+
+def test_storage_engine_recovery(tmp_path):
+    storage = StorageEngine(str(tmp_path), snapshot_every=5).load()
+    alice = storage.add_customer(Customer("Alice", "1234567890", "alice@example.com"))
+    stock = storage.add_stock(Stock("1984", "George Orwell", 8.99))
+    storage.place_orders([(alice, stock, i % 2 == 0, date(2025, 1, 15)) for i in range(7)])
+    storage.place_orders([(alice, stock, True, date(2025, 1, 16))])
+    stock.price = 9.99
+    storage.close()
+
+    # A torn record at the end of the log is dropped on recovery.
+    with open(tmp_path / LOG_FILE, "ab") as f:
+        f.write(b"\x10\x00\x00")
+
+    restored = StorageEngine(str(tmp_path)).load()
+    assert len(restored.bookstore) == 8
+    assert [c.email for c in restored.customers] == ["alice@example.com"]
+    assert restored.bookstore.search_invoice("INV0008").invoice() == 15.44
+    assert restored.bookstore.stock_revenue(restored.stocks[0]) == 119.02
+    restored.close()
+
+
+def test_storage_engine_keeps_order_edits(tmp_path):
+    storage = StorageEngine(str(tmp_path)).load()
+    alice = storage.add_customer(Customer("Alice", "1234567890", "alice@example.com"))
+    orwell = storage.add_stock(Stock("1984", "George Orwell", 8.99))
+    emma = Stock("Emma", "Jane Austen", 6.50)
+    edited, emptied = storage.place_orders([(alice, [(orwell, 1), (emma, 1)], False, date(2025, 1, 1)),
+                                            (alice, orwell, False, date(2025, 1, 1))])
+    edited.ship_order.order.set_quantity(emma, 5)
+    edited.ship_order.ship_cost = 10.0
+    emptied.ship_order.order.remove_line(orwell)
+    orwell.price = 9.99
+    totals = [edited.total_cents, emptied.total_cents]
+    assert totals == [5249, 395]
+    storage.close()
+
+    restored = StorageEngine(str(tmp_path)).load()
+    assert [restored.bookstore.search_invoice(nbr).total_cents for nbr in ("INV0001", "INV0002")] == totals
+    restored.snapshot()
+    restored.close()
+
+    reloaded = StorageEngine(str(tmp_path)).load()
+    assert [reloaded.bookstore.search_invoice(nbr).total_cents for nbr in ("INV0001", "INV0002")] == totals
+    assert reloaded.bookstore.search_invoice("INV0002").ship_order.order.lines == ()
+    reloaded.close()
+
+
+def test_concurrent_place_orders_is_all_or_nothing():
+    customer = Customer("Alice", "1234567890", "alice@example.com")
+    stock = Stock("1984", "George Orwell", 8.99)
+    inventory = Inventory()
+    inventory.receive(stock, 10)
+    bookstore = ConcurrentBookStore(shards=4)
+    placed = bookstore.place_orders([(customer, stock, False, date(2025, 1, 15))] * 8)
+    taken = max(placed, key=lambda invoice: bookstore._shard_of(invoice.invoice_nbr))
+    # Shards store in index order, so these are stored before the duplicate fails.
+    numbers = [nbr for nbr in (f"INV9{i:03}" for i in range(40))
+               if bookstore._shard_of(nbr) < bookstore._shard_of(taken.invoice_nbr)][:3]
+    bookstore.allocate_invoice_nbrs = lambda count: numbers + [taken.invoice_nbr]
+    try:
+        bookstore.place_orders([(customer, stock, False, date(2025, 1, 15))] * 4, inventory)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("duplicate invoice number accepted")
+    assert len(numbers) == 3
+    assert len(bookstore) == 8 and not any(nbr in bookstore for nbr in numbers)
+    assert bookstore.stats()["count"] == 8 and bookstore.revenue == 103.52
+    assert inventory.available(stock) == 10
+
+
+def test_place_orders_reserves_inventory():
+    customer = Customer("Alice", "1234567890", "alice@example.com")
+    stock = Stock("1984", "George Orwell", 8.99)
+    inventory = Inventory(threshold=1)
+    inventory.receive(stock, 2)
+    bookstore = BookStore()
+
+    try:
+        bookstore.place_orders([(customer, stock, False, date(2025, 1, 15))] * 3, inventory)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("oversold stock")
+    assert len(bookstore) == 0
+    assert inventory.available(stock) == 2
+
+    bookstore.place_orders([(customer, stock, False, date(2025, 1, 15))] * 2, inventory)
+    level = inventory.level(stock)
+    assert (level.on_hand, level.reserved, level.committed) == (0, 0, 2)
+    assert inventory.low_stock() == [stock]
+
+
+def test_order_pipeline():
+    customer = Customer("Alice", "1234567890", "alice@example.com")
+    stock = Stock("1984", "George Orwell", 8.99)
+    bookstore = BookStore()
+
+    async def run():
+        async with OrderPipeline(bookstore, {"ship": 2, "persist": 3}, queue_size=2) as pipeline:
+            futures = [await pipeline.submit(customer, stock, i % 2 == 0, date(2025, 1, 15)) for i in range(50)]
+            rejected = await pipeline.submit("nobody", stock, False, date(2025, 1, 15))
+            invoices = await asyncio.gather(*futures)
+            try:
+                await rejected
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("invalid customer accepted")
+        return pipeline, invoices
+
+    pipeline, invoices = asyncio.run(run())
+    assert len(bookstore) == 50
+    assert len({inv.invoice_nbr for inv in invoices}) == 50
+    assert pipeline.histograms["total"].count == 50
+    assert pipeline.histograms["validate"].count == 51
+
+
+def test_orders_are_quoted_by_zone_weight_and_carrier():
+    from bookstore_rates import RateEngine, RateTable
+    customer = Customer("Alice", "1234567890", "alice@example.com")
+    stock = Stock("1984", "George Orwell", 8.99)
+    default = Shipping.rate_engine
+    Shipping.rate_engine = RateEngine(RateTable([
+        ("domestic", "post", 1.0, False, 3.95),
+        ("domestic", "post", 5.0, False, 6.50),
+        ("domestic", "courier", 5.0, False, 5.90),
+        ("abroad", "post", 5.0, False, 12.00),
+    ]))
+    try:
+        bookstore = BookStore()
+        invoices = bookstore.place_orders([
+            (customer, stock, False, date(2025, 1, 15), "domestic"),
+            (customer, stock, False, date(2025, 1, 15), "domestic", 2.0),
+            (customer, stock, False, date(2025, 1, 15), "domestic", 2.0, "post"),
+            (customer, stock, False, date(2025, 1, 15), "abroad", 2.0),
+        ])
+        assert [inv.ship_order.ship_cost for inv in invoices] == [3.95, 5.9, 6.5, 12.0]
+
+        async def run():
+            async with OrderPipeline(bookstore) as pipeline:
+                return await pipeline.place_order(customer, stock, False, date(2025, 1, 15), "abroad", 2.0)
+        assert asyncio.run(run()).ship_order.ship_cost == 12.0
+    finally:
+        Shipping.rate_engine = default
+
+
+def test_order_pipeline_survives_stage_errors():
+    class FlakyPipeline(OrderPipeline):
+        def _persist(self, job):
+            if job["is_urgent"]:
+                raise ConnectionError("store unavailable")
+            super()._persist(job)
+
+    customer = Customer("Alice", "1234567890", "alice@example.com")
+    stock = Stock("1984", "George Orwell", 8.99)
+    bookstore = BookStore()
+
+    async def run():
+        async with FlakyPipeline(bookstore) as pipeline:
+            futures = [await pipeline.submit(customer, stock, i < 2, date(2025, 1, 15)) for i in range(4)]
+            return await asyncio.gather(*futures, return_exceptions=True)
+
+    results = asyncio.run(asyncio.wait_for(run(), 5))
+    assert [type(result) for result in results] == [ConnectionError, ConnectionError, Invoice, Invoice]
+    assert len(bookstore) == 2
+
+def test_money_is_exact_in_cents():
+    stock = Stock("Pamphlet", "Anonymous", 0.10)
+    customer = Customer("Alice", "1234567890", "alice@example.com")
+    assert stock.price_cents == 10
+
+    bookstore = BookStore()
+    bookstore.place_orders([(customer, stock, False, date(2025, 1, 1))] * 3)
+    assert bookstore.revenue == 12.15
+    assert sum(invoice.total_cents for invoice in bookstore.invoices) == 1215
+
+    try:
+        stock.price = 0.004
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("price rounding to zero cents accepted")
+
+
+def test_invoice_view_paging():
+    alice = Customer("Alice", "1234567890", "alice@example.com")
+    bob = Customer("Bob", "9876543210", "bob@example.com")
+    stock = Stock("1984", "George Orwell", 8.99)
+    bookstore = BookStore()
+    bookstore.place_orders([(alice if i % 2 else bob, stock, i % 3 == 0, date(2025, 1, 1 + i % 28))
+                            for i in range(100)])
+
+    view = bookstore.view("invoice_nbr")
+    assert len(view) == 100
+    assert [inv.invoice_nbr for inv in view.page(10, 3)] == ["INV0011", "INV0012", "INV0013"]
+    assert [inv.invoice_nbr for inv in bookstore.view("invoice_nbr", descending=True).page(0, 2)] == ["INV0100", "INV0099"]
+
+    # The sorted index is maintained as invoices are added and removed.
+    bookstore.place_orders([(alice, stock, False, date(2025, 2, 1))] * 2)
+    bookstore.remove_invoice("INV0001")
+    view = bookstore.view("invoice_nbr")
+    assert len(view) == 101
+    assert view.page(0, 1)[0].invoice_nbr == "INV0002"
+    assert view.page(100, 10)[0].invoice_nbr == "INV0102"
+
+    dates = [inv.ship_order.ship_date for inv in bookstore.view("ship_date", email="bob@example.com").page(0, 50)]
+    assert len(dates) == 49 and dates == sorted(dates)
+
+
+def test_registries_enforce_keys_and_survive_restart(tmp_path):
+    storage = StorageEngine(str(tmp_path)).load()
+    alice = storage.add_customer(Customer("Alice", "1234567890", "alice@example.com"))
+    book = storage.add_stock(Stock("1984", "George Orwell", 8.99, isbn="978-0-452-28423-4"))
+    storage.place_orders([(alice, book, False, date(2025, 1, 1))])
+    for duplicate in (lambda: storage.add_customer(Customer("Alice B", "5550001111", "ALICE@example.com")),
+                      lambda: storage.add_stock(Stock("Nineteen Eighty-Four", "Orwell", 9.99, isbn="9780452284234"))):
+        try:
+            duplicate()
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("duplicate key accepted")
+    storage.close()
+
+    restored = StorageEngine(str(tmp_path)).load()
+    assert restored.customers.id_of(restored.customers.by_email("alice@example.com")) == 0
+    assert restored.stocks.by_isbn("9780452284234").name == "1984"
+    assert len(restored.customers) == 1 and len(restored.stocks) == 1
+    author = "".join(["George ", "Orwell"])
+    assert Stock("Animal Farm", author, 7.49).author is restored.stocks[0].author
+    restored.close()
+
+
+def test_sharded_bookstore_partitions():
+    alice = Customer("Alice", "1234567890", "alice@example.com")
+    bob = Customer("Bob", "9876543210", "bob@example.com")
+    stock = Stock("1984", "George Orwell", 8.99)
+    for partition in ("invoice_nbr", "customer"):
+        with ShardedBookStore(workers=3, partition=partition) as bookstore:
+            invoices = bookstore.place_orders([(alice if i % 2 else bob, stock, i % 3 == 0, date(2025, 1, 1))
+                                               for i in range(30)])
+            assert [inv.invoice_nbr for inv in invoices] == [f"INV{i:04}" for i in range(1, 31)]
+            assert len(bookstore) == 30
+            assert "INV0030" in bookstore and "INV0031" not in bookstore
+            assert len(bookstore.invoices_for_customer("alice@example.com")) == 15
+            assert bookstore.stats()["urgent"] == 10
+            assert bookstore.revenue == (30 * 1294 + 10 * 150) / 100
+            assert bookstore.customer_revenue("bob@example.com") == sum(
+                inv.total_cents for inv in invoices if inv.ship_order.order.customer.email == bob.email) / 100
+            try:
+                bookstore.add_invoice(invoices[0])
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("duplicate invoice number accepted")
+
+            urgent_before = Shipping.count_urgent
+            try:
+                bookstore.place_orders([(alice, stock, True, date(2025, 1, 2))] * 7 + [(bob, [], True, date(2025, 1, 2))])
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("empty order accepted")
+            assert len(bookstore) == 30 and Shipping.count_urgent == urgent_before
+
+
+def test_multi_line_orders(tmp_path):
+    alice = Customer("Alice", "1234567890", "alice@example.com")
+    orwell = Stock("1984", "George Orwell", 8.99)
+    austen = Stock("Emma", "Jane Austen", 6.50)
+    inventory = Inventory()
+    inventory.receive(orwell, 5)
+    inventory.receive(austen, 5)
+
+    storage = StorageEngine(str(tmp_path)).load()
+    invoice, = storage.place_orders([(alice, [(orwell, 2), (austen, 3)], False, date(2025, 1, 1))])
+    bookstore = storage.bookstore
+    assert invoice.total_cents == 2 * 899 + 3 * 650 + 395
+    assert invoice.ship_order.order.subtotal_cents == 3748
+    assert [inv.invoice_nbr for inv in bookstore.invoices_for_stock(austen)] == [invoice.invoice_nbr]
+    assert bookstore.stock_revenue(orwell) == 21.93 and bookstore.stock_revenue(austen) == 19.5
+
+    order = invoice.ship_order.order
+    order.add_line(orwell)
+    assert order.subtotal_cents == 3 * 899 + 3 * 650
+    order.remove_line(orwell)
+    assert order.lines[0].stock is austen and order.subtotal_cents == 1950
+    order.set_quantity(austen, 3)
+    order.add_line(orwell, 2)
+    storage.close()
+
+    restored = StorageEngine(str(tmp_path)).load()
+    again = restored.bookstore.search_invoice(invoice.invoice_nbr)
+    assert [(line.stock.name, line.quantity) for line in again.ship_order.order.lines] == [("Emma", 3), ("1984", 2)]
+    assert again.invoice() == 41.43
+    restored.close()
+
+    cart, = bookstore.place_orders([(alice, [(orwell, 2), (austen, 3)], False, date(2025, 1, 2))])
+    cart.ship_order.order.remove_line(orwell)
+    assert cart.stock is austen and cart.total_cents == 2345
+    assert bookstore.stock_revenue(austen) == 46.9 and bookstore.stock_revenue(orwell) == 17.98
+    assert [inv.invoice_nbr for inv in bookstore.invoices_for_stock(austen)] == [invoice.invoice_nbr,
+                                                                              cart.invoice_nbr]
+    bookstore.remove_invoice(cart.invoice_nbr)
+
+    BookStore().place_orders([(alice, [(orwell, 4)], False, date(2025, 1, 1))], inventory=inventory)
+    assert inventory.available(orwell) == 1
+    assert bookstore.remove_invoice(invoice.invoice_nbr) is invoice
+    assert bookstore.stock_revenue(orwell) == 0 and bookstore.revenue == 0
+
+
+def test_metrics_are_opt_in(tmp_path):
+    original = BookStore.add_invoice
+    customer = Customer("Alice", "1234567890", "alice@example.com")
+    stock = Stock("1984", "George Orwell", 8.99)
+    with instrumented() as metrics:
+        assert BookStore.add_invoice is not original
+        bookstore = BookStore()
+        bookstore.place_orders([(customer, stock, False, date(2025, 1, 1)) for _ in range(3)])
+        assert len(bookstore.invoices_for_customer(customer.email)) == 3
+        bookstore.search_invoice("INV0001").invoice()
+        try:
+            customer.email = "not-an-email"
+        except ValueError:
+            pass
+    assert BookStore.add_invoice is original
+    customer.name = "Alice B"
+
+    snapshot = metrics.snapshot()
+    assert snapshot["Invoice.invoice"]["count"] == 1
+    assert snapshot["BookStore.place_orders"]["count"] == snapshot["BookStore.store_invoices"]["count"] == 1
+    assert metrics.rows["BookStore.place_orders"].total == 3
+    assert metrics.rows["RateEngine.quote_many"].total == 3
+    assert snapshot["Person.email"]["errors"] == 1
+    assert snapshot["Person.name"]["count"] == 0
+    assert metrics.rows["BookStore.invoices_for_customer"].total == 3
+    path = str(tmp_path / "bookstore.prom")
+    metrics.write_prometheus(path)
+    with open(path) as f:
+        assert 'bookstore_result_rows_count{op="BookStore.invoices_for_customer"} 1' in f.read()
+
+
+def test_invoice_totals_follow_their_inputs():
+    import pickle
+    alice = Customer("Alice", "1234567890", "alice@example.com")
+    orwell = Stock("1984", "George Orwell", 8.99)
+    austen = Stock("Emma", "Jane Austen", 6.5)
+    bookstore = BookStore()
+    cart, single = bookstore.place_orders([(alice, [(orwell, 2), (austen, 1)], False, date(2025, 1, 1)),
+                                           (alice, austen, True, date(2025, 1, 2))])
+    assert cart.invoice() == 28.43 and bookstore.revenue == 40.38
+
+    assert [inv.invoice_nbr for inv in bookstore.view("total").page(0, 2)] == ["INV0002", "INV0001"]
+    austen.price = 7.5
+    assert (cart.total_cents, single.total_cents) == (2943, 1295)
+    assert bookstore.revenue == 42.38 and bookstore.stock_revenue(austen) == 20.45
+    assert [inv.invoice_nbr for inv in bookstore.view("total").page(0, 2)] == ["INV0002", "INV0001"]
+
+    single.ship_order.ship_cost = 3.95
+    assert single.total_cost == 11.45 and bookstore.customer_revenue(alice.email) == 40.88
+    bookstore.remove_invoice(cart.invoice_nbr)
+    orwell.price = 1.0
+    assert bookstore.revenue == 11.45 and bookstore.stock_revenue(orwell) == 0
+
+    copy = pickle.loads(pickle.dumps(single))
+    copy.ship_order.order.lines[0].stock.price = 8.5
+    assert copy.total_cents == 1245 and single.total_cents == 1145
+    book = copy.ship_order.order.lines[0].stock
+    assert book.name is austen.name and book.author is austen.author
+
+
+def test_validators_reject_like_the_setters():
+    rows = [("1984", "George Orwell", 8.99, None), ("", "George Orwell", 8.99, None),
+            ("Emma", "  ", 6.5, None), ("Emma", "Jane Austen", 0.001, None),
+            ("Emma", "", -1, "978-0-452-28423-4"), ("Emma", "Jane Austen", 6.5, "12-34")]
+    expected = {}
+    for row, fields in enumerate(rows):
+        try:
+            Stock(*fields)
+        except ValueError as e:
+            expected[row] = str(e)
+            try:
+                validator_for(Stock)(*fields)
+            except ValueError as again:
+                assert str(again) == str(e)
+            else:
+                raise AssertionError(f"row {row} passed validation")
+        else:
+            validator_for(Stock)(*fields)
+    columns = {field: [fields[i] for fields in rows] for i, field in enumerate(validator_for(Stock).fields)}
+    assert validator_for(Stock).check_columns(columns) == expected
+    assert list(expected) == [1, 2, 3, 4, 5]
+    try:
+        Stock("Emma", "Jane Austen", "6.50")
+    except TypeError as e:
+        message = str(e)
+    assert validator_for(Stock).check_columns({"name": ["Emma", "1984"], "author": ["Jane Austen", "George Orwell"],
+                                               "price": ["6.50", 8.99]}) == {0: message}
+    assert validator_for(Customer).check_columns({"name": ["Alice"], "email": ["alice@example.com"]}) == \
+        {0: "Phone cannot be empty."}
+    assert validator_for(Stock).check_columns({"name": ["Emma"], "price": [6.5]}) == \
+        {0: "Author name cannot be empty."}
+    for make in (lambda: Customer(None, "1234567890", "alice@example.com"), lambda: Stock("Emma", None, 6.5)):
+        try:
+            make()
+        except AttributeError:
+            pass
+        else:
+            raise AssertionError("None accepted")
+
+    trusted = Stock.from_trusted("1984", "George Orwell", 8.99, "9780452284234")
+    stock = Stock("1984", "George Orwell", 8.99, "978-0-452-28423-4")
+    assert (trusted.name, trusted.author, trusted.price_cents, trusted.isbn) == \
+        (stock.name, stock.author, stock.price_cents, stock.isbn)
+    assert trusted.author is stock.author
+
+
+def test_sqlite_bookstore_reopens_and_serves_readers(tmp_path):
+    path = str(tmp_path / "bookstore.db")
+    alice = Customer("Alice", "1234567890", "alice@example.com")
+    bookstore = SQLiteBookStore(path)
+    placed = bookstore.place_orders([(alice, Stock("1984", "George Orwell", 8.99), False, date(2025, 1, 1)),
+                                     (alice, Stock("Emma", "Jane Austen", 6.50, isbn="978-0-14-143958-7"),
+                                      True, date(2025, 1, 2))])
+    assert [inv.invoice_nbr for inv in placed] == ["INV0001", "INV0002"]
+    assert bookstore.allocate_invoice_nbrs() != bookstore.allocate_invoice_nbrs()
+    bookstore.close()
+
+    reopened = SQLiteBookStore(path)
+    read_back = reopened.search_invoice("INV0001")
+    assert read_back.total_cents == placed[0].total_cents
+    assert reopened.search_invoice("INV0002").total_cents == placed[1].total_cents
+    again = reopened.place_orders([(alice, read_back.stock, False, date(2025, 1, 3)),
+                                   (alice, Stock("Emma", "J. Austen", 6.50, isbn="9780141439587"),
+                                    False, date(2025, 1, 3))])
+    assert [inv.invoice_nbr for inv in again] == ["INV0005", "INV0006"]
+    with reopened._reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM stocks").fetchone()[0] == 2
+        assert conn.execute("SELECT typeof(total_cents) FROM invoices LIMIT 1").fetchone()[0] == "integer"
+
+    def read(_):
+        return len(reopened.invoices_for_customer("alice@example.com")), len(list(reopened.get_invoices))
+
+    writer = threading.Thread(target=reopened.place_orders,
+                              args=([(alice, read_back.stock, False, date(2025, 2, 1))] * 50,))
+    writer.start()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        counts = list(pool.map(read, range(40)))
+    writer.join()
+    assert {n for pair in counts for n in pair} <= {4, 54}
+    assert len(reopened) == 54 and reopened.search_invoice("INV0056").invoice() == 12.94
+    reopened.close()
+
+
+def test_sqlite_bookstore_reads_back_the_sold_price(tmp_path):
+    path = str(tmp_path / "bookstore.db")
+    alice = Customer("Alice", "1234567890", "alice@example.com")
+    stock = Stock("1984", "George Orwell", 8.99)
+    bookstore = SQLiteBookStore(path)
+    bookstore.place_orders([(alice, stock, False, date(2025, 1, 1))])
+    stock.price = 20.00
+    bookstore.place_orders([(alice, stock, False, date(2025, 1, 2))])
+    bookstore.close()
+
+    reopened = SQLiteBookStore(path)
+    assert [inv.total_cents for inv in reopened.get_invoices] == [1294, 2395]
+    with reopened._reader() as conn:
+        assert [row[0] for row in conn.execute("SELECT total_cents FROM invoices ORDER BY rowid")] == [1294, 2395]
+        assert conn.execute("SELECT price_cents FROM stocks").fetchall() == [(899,)]
+    reopened.close()
+
+
+def test_multi_line_orders_store_and_export(tmp_path):
+    alice = Customer("Alice", "1234567890", "alice@example.com")
+    orwell = Stock("1984", "George Orwell", 8.99)
+    austen = Stock("Emma", "Jane Austen", 6.50)
+    batch = [(alice, [(orwell, 2), (austen, 1)], False, date(2025, 1, 1)), (alice, orwell, True, date(2025, 1, 2))]
+    bookstore = SQLiteBookStore(str(tmp_path / "bookstore.db"))
+    placed = bookstore.place_orders(batch)
+    bookstore.close()
+
+    reopened = SQLiteBookStore(str(tmp_path / "bookstore.db"))
+    read_back = list(reopened.get_invoices)
+    assert [inv.total_cents for inv in read_back] == [inv.total_cents for inv in placed] == [2843, 1444]
+    assert [(line.stock.name, line.quantity) for line in read_back[0].ship_order.order.lines] == \
+        [("1984", 2), ("Emma", 1)]
+    assert [inv.invoice_nbr for inv in reopened.invoices_for_customer("alice@example.com")] == ["INV0001", "INV0002"]
+    reopened.close()
+
+    export_invoices(str(tmp_path / "invoices.bin"), placed)
+    with InvoiceFile(str(tmp_path / "invoices.bin")) as invoice_file:
+        assert invoice_file.total() == 42.87
+        assert [inv.total_cents for inv in invoice_file.load_invoices()] == [2843, 1444]
+
+
+def test_import_rejects_malformed_jsonl_lines(tmp_path):
+    feed = tmp_path / "books.jsonl"
+    feed.write_text('{"name": "1984", "author": "George Orwell", "price": 8.99}\n'
+                    '{"name": "Emma", "author": \n'
+                    '\n'
+                    '[1, 2]\n'
+                    '{"name": "Emma", "author": "Jane Austen", "price": "6.50"}\n')
+    for workers in (None, 2):
+        rejects = tmp_path / f"rejects-{workers}.jsonl"
+        assert [stock.name for stock in import_stocks(str(feed), str(rejects), workers, chunk_size=2)] == \
+            ["1984", "Emma"]
+        rejected = [json.loads(line) for line in rejects.read_text().splitlines()]
+        assert [(r["row"], r["record"]) for r in rejected] == [(2, '{"name": "Emma", "author": '), (3, [1, 2])]
+
+
 if __name__ == "__main__":
     test_bookstore()
-